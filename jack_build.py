@@ -169,10 +169,10 @@ jack_port_t* jack_port_by_id(jack_client_t* client, jack_port_id_t port_id);
 jack_nframes_t jack_frames_since_cycle_start(const jack_client_t*);
 jack_nframes_t jack_frame_time(const jack_client_t*);
 jack_nframes_t jack_last_frame_time(const jack_client_t* client);
-/* TODO: jack_get_cycle_times */
-/* TODO: jack_frames_to_time */
-/* TODO: jack_time_to_frames */
-/* TODO: jack_get_time */
+int jack_get_cycle_times(const jack_client_t* client, jack_nframes_t* current_frames, jack_time_t* current_usecs, jack_time_t* next_usecs, float* period_usecs);
+jack_time_t jack_frames_to_time(const jack_client_t* client, jack_nframes_t);
+jack_nframes_t jack_time_to_frames(const jack_client_t* client, jack_time_t);
+jack_time_t jack_get_time(void);
 void jack_set_error_function(void (*func)(const char*));
 void jack_set_info_function(void (*func)(const char*));
 void jack_free(void* ptr);
@@ -224,7 +224,9 @@ void jack_transport_stop(jack_client_t* client);
 
 /* statistics.h */
 
+float jack_get_max_delayed_usecs(jack_client_t* client);
 float jack_get_xrun_delayed_usecs(jack_client_t* client);
+void jack_reset_max_delayed_usecs(jack_client_t* client);
 
 /* midiport.h */
 
@@ -25,9 +25,26 @@ http://jackclient-python.readthedocs.io/
 """
 __version__ = '0.5.5'
 
+import bisect as _bisect
+from collections import OrderedDict as _OrderedDict, deque as _deque
+from collections.abc import Mapping as _Mapping
 from ctypes.util import find_library as _find_library
 import errno as _errno
+import fnmatch as _fnmatch
+import functools as _functools
+import heapq as _heapq
+import http.server as _http_server
+import json as _json
+import mmap as _mmap
+import os as _os
 import platform as _platform
+import re as _re
+import socketserver as _socketserver
+import struct as _struct
+import sys as _sys
+import threading as _threading
+import time as _time
+import traceback as _traceback
 import warnings as _warnings
 
 from _jack import ffi as _ffi
@@ -80,6 +97,10 @@ POSITION_VIDEO_FRAME_OFFSET = _lib.JackVideoFrameOffset
 _SUCCESS = 0
 _FAILURE = 1
 
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+_WAV_HEADER_SIZE = 4096
+
 
 def _decode(cdata):
     return _ffi.string(cdata).decode()
@@ -221,9 +242,21 @@ class Client:
         self._midi_outports = Ports(self, _MIDI, _lib.JackPortIsOutput)
         self._keepalive = []
         self._position = _ffi.new('jack_position_t*')
+        self._cycle_frames = _ffi.new('jack_nframes_t*')
+        self._cycle_usecs = _ffi.new('jack_time_t[2]')
+        self._period_usecs = _ffi.new('float*')
+        self._active = False
+        self._port_cache = {}
+        self._listeners = []
+        self._graph_changes = None
+        self._process_timing = None
+        self._deadline_monitor = None
+        self._set_internal_callbacks()
 
     # Avoid confusion if something goes wrong before opening the client:
     _ptr = _ffi.NULL
+    _graph_changes = None
+    _deadline_monitor = None
 
     def __enter__(self):
         self.activate()
@@ -338,6 +371,99 @@ class Client:
         """
         return _lib.jack_last_frame_time(self._ptr)
 
+    def cycle_times(self):
+        """Get the timing of the current process cycle.
+
+        This may only be used from the process callback (see
+        `set_process_callback()`).  It provides the internal cycle
+        timing information as used by most of the other time related
+        functions.  This allows the caller to map between frame counts
+        and microseconds with full precision (i.e. without rounding
+        frame times to integers), and also provides e.g. the
+        microseconds time of the start of the current cycle directly.
+
+        Returns
+        -------
+        current_frames : int
+            Frame time of the current cycle, see `last_frame_time`.
+        current_usecs : int
+            Microseconds time of the start of the current cycle.
+        next_usecs : int
+            Predicted microseconds time of the start of the next cycle.
+        period_usecs : float
+            Current best estimate of the duration of one period in
+            microseconds.
+
+        Raises
+        ------
+        JackError
+            If the cycle times cannot be obtained.
+
+        See Also
+        --------
+        frames_to_time, time_to_frames, get_time
+
+        """
+        _check(_lib.jack_get_cycle_times(
+            self._ptr, self._cycle_frames, self._cycle_usecs,
+            self._cycle_usecs + 1, self._period_usecs),
+            'Error getting cycle times')
+        return (self._cycle_frames[0], self._cycle_usecs[0],
+                self._cycle_usecs[1], self._period_usecs[0])
+
+    def frames_to_time(self, frames):
+        """Get the estimated time in microseconds of a frame time.
+
+        See Also
+        --------
+        time_to_frames, get_time, frame_time
+
+        """
+        return _lib.jack_frames_to_time(self._ptr, frames)
+
+    def time_to_frames(self, usecs):
+        """Get the estimated frame time of a time in microseconds.
+
+        See Also
+        --------
+        frames_to_time, get_time, frame_time
+
+        """
+        return _lib.jack_time_to_frames(self._ptr, usecs)
+
+    def frame_offset(self, usecs, frames):
+        """Get the offset within the current block for a timestamp.
+
+        This may only be used from the process callback (see
+        `set_process_callback()`).  It can be used to place events that
+        were received in other threads (and timestamped with
+        `get_time()`) at sample-accurate positions.  All events are
+        delayed by one block, which avoids jitter: an event that was
+        received during the previous cycle is placed at the same offset
+        in the current block.
+
+        Parameters
+        ----------
+        usecs : int
+            Time in microseconds, as returned by `get_time()`.
+        frames : int
+            The block size of the current cycle, as passed to the
+            process callback.
+
+        Returns
+        -------
+        int
+            An offset between 0 and ``frames - 1``.  Older events are
+            placed at the beginning of the block, newer events at the
+            end.
+
+        """
+        offset = (_lib.jack_time_to_frames(self._ptr, usecs) + frames
+                  - _lib.jack_last_frame_time(self._ptr)) & 0xFFFFFFFF
+        if offset >= 0x80000000:
+            return 0  # Negative offset (after wrap-around)
+        return offset if offset < frames else frames - 1
+
     @property
     def inports(self):
         """A list of audio input `Ports`.
@@ -431,6 +557,15 @@ class Client:
 
         """
         _check(_lib.jack_activate(self._ptr), 'Error activating JACK client')
+        # Port objects are only cached while notifications are received:
+        self._port_cache.clear()
+        for ports in (self._inports, self._outports,
+                      self._midi_inports, self._midi_outports):
+            for port in ports._portdict.values():
+                # Names might have changed while inactive:
+                port._name = port._shortname = None
+                self._port_cache[port._ptr] = port
+        self._active = True
 
     def deactivate(self, ignore_errors=True):
         """De-activate JACK client.
@@ -441,6 +576,8 @@ class Client:
 
         """
         err = _lib.jack_deactivate(self._ptr)
+        self._active = False
+        self._port_cache.clear()
         if not ignore_errors:
             _check(err, 'Error deactivating JACK client')
 
@@ -454,11 +591,53 @@ class Client:
         """
         return _lib.jack_cpu_load(self._ptr)
 
+    def max_delayed_usecs(self):
+        """Return the maximum delay reported by the backend since startup.
+
+        The delay (in microseconds) is reset with
+        `reset_max_delayed_usecs()`.
+
+        """
+        return _lib.jack_get_max_delayed_usecs(self._ptr)
+
+    def reset_max_delayed_usecs(self):
+        """Reset the maximum delay, see `max_delayed_usecs()`."""
+        _lib.jack_reset_max_delayed_usecs(self._ptr)
+
+    def xrun_tracker(self, size=1024):
+        """Get an object that records information about xruns.
+
+        Xruns are only reported while the client is active.
+
+        Parameters
+        ----------
+        size : int, optional
+            Maximum number of xruns that are remembered.
+
+        Returns
+        -------
+        XrunTracker
+
+        See Also
+        --------
+        set_xrun_callback
+
+        """
+        return XrunTracker(self, size)
+
     def close(self, ignore_errors=True):
         """Close the JACK client."""
+        if self._graph_changes is not None:
+            self._graph_changes.stop()
+            self._graph_changes = None
+        if self._deadline_monitor is not None:
+            self._deadline_monitor.stop()
+            self._deadline_monitor = None
         if self._ptr:
             err = _lib.jack_client_close(self._ptr)
             self._ptr = _ffi.NULL
+            self._active = False
+            self._port_cache.clear()
             if not ignore_errors:
                 _check(err, 'Error closing JACK client')
 
@@ -518,6 +697,86 @@ class Client:
             self._ptr, source.encode(), destination.encode()),
             f"Couldn't disconnect {source!r} -> {destination!r}")
 
+    def apply_connections(self, desired, exclusive=False, graph=None):
+        """Establish a given set of connections.
+
+        Only the connections that don't exist yet are made (and with
+        *exclusive*, only the superfluous ones are removed).  Errors are
+        collected instead of being raised, so that as many connections
+        as possible are established.
+
+        Parameters
+        ----------
+        desired : iterable of (str or Port, str or Port)
+            Pairs of source and destination ports, see `connect()`.
+        exclusive : bool, optional
+            If ``True``, existing connections of all ports that appear
+            in *desired* are removed if they are not part of *desired*.
+        graph : GraphSnapshot, optional
+            The current connections.  If not given,
+            `graph_snapshot()` is used to get them.  Passing a live
+            snapshot avoids querying the whole graph.
+
+        Returns
+        -------
+        connected : list of (str, str)
+            Pairs of port names which have been connected.
+        disconnected : list of (str, str)
+            Pairs of port names which have been disconnected.
+        errors : list of ((str, str), JackError)
+            Pairs of port names which could not be (dis)connected,
+            together with the corresponding exception.
+
+        See Also
+        --------
+        connect, disconnect, graph_snapshot
+
+        """
+        pairs = {}
+        for source, destination in desired:
+            if isinstance(source, Port):
+                source = source.name
+            if isinstance(destination, Port):
+                destination = destination.name
+            pairs[source, destination] = None
+        if graph is None:
+            graph = self.graph_snapshot()
+        with graph.lock:
+            current = set(graph.connections)
+        obsolete = []
+        if exclusive:
+            names = {name for pair in pairs for name in pair}
+            obsolete = sorted(pair for pair in current - pairs.keys()
+                              if pair[0] in names or pair[1] in names)
+        encoded = {}
+        for pair in pairs.keys() | obsolete:
+            for name in pair:
+                if name not in encoded:
+                    encoded[name] = name.encode()
+        connected, disconnected, errors = [], [], []
+        for source, destination in obsolete:
+            err = _lib.jack_disconnect(self._ptr, encoded[source],
+                                       encoded[destination])
+            if err:
+                errors.append(((source, destination), JackErrorCode(
+                    f"Couldn't disconnect {source!r} -> {destination!r}",
+                    err)))
+            else:
+                disconnected.append((source, destination))
+        for source, destination in pairs:
+            if (source, destination) in current:
+                continue
+            err = _lib.jack_connect(self._ptr, encoded[source],
+                                    encoded[destination])
+            if err == _errno.EEXIST:
+                continue
+            if err:
+                errors.append(((source, destination), JackErrorCode(
+                    f'Error connecting {source!r} -> {destination!r}', err)))
+            else:
+                connected.append((source, destination))
+        return connected, disconnected, errors
+
     def transport_start(self):
         """Start JACK transport."""
         _lib.jack_transport_start(self._ptr)
@@ -618,6 +877,25 @@ class Client:
         state = _lib.jack_transport_query(self._ptr, self._position)
         return state, self._position
 
+    def transport_snapshot(self):
+        """Query the current transport state and position.
+
+        Opposed to `transport_query()`, the returned object can be
+        updated in place with `TransportSnapshot.update()`, which
+        doesn't create any new objects.  This is cheap enough to be
+        done in each process callback.
+
+        Returns
+        -------
+        TransportSnapshot
+
+        See Also
+        --------
+        transport_query, transport_query_struct
+
+        """
+        return TransportSnapshot(self)
+
     def transport_reposition_struct(self, position):
         """Request a new transport position.
 
@@ -741,11 +1019,13 @@ class Client:
         """
         @self._callback('JackInfoShutdownCallback')
         def callback_wrapper(code, reason, _):
-            callback(Status(code), _decode(reason))
+            status, reason = Status(code), _decode(reason)
+            self._notify('shutdown', status, reason)
+            callback(status, reason)
 
         _lib.jack_on_info_shutdown(self._ptr, callback_wrapper, _ffi.NULL)
 
-    def set_process_callback(self, callback):
+    def set_process_callback(self, callback, timing=False, deadline=None):
         """Register process callback.
 
         Tell the JACK server to call *callback* whenever there is work
@@ -796,19 +1076,87 @@ class Client:
             anymore.  The exception `CallbackExit` can be used to
             silently prevent further callback invocations, all other
             exceptions will print an error message to *stderr*.
+        timing : bool, optional
+            If ``True``, the duration of each call is measured, see
+            `process_timing`.
+        deadline : float, optional
+            If given, each call is compared to the period budget
+            (`blocksize` / `samplerate`).  Calls that take longer than
+            the given fraction of the budget are reported, see
+            `deadline_monitor` and `DeadlineMonitor`.  This must be a
+            positive number.
 
         """
-        @self._callback('JackProcessCallback', error=_FAILURE)
-        def callback_wrapper(frames, _):
-            try:
-                callback(frames)
-            except CallbackExit:
-                return _FAILURE
-            return _SUCCESS
+        if self._deadline_monitor is not None:
+            self._deadline_monitor.stop()
+            self._deadline_monitor = None
+        monitor = None
+        if deadline is not None:
+            if not deadline > 0:
+                raise ValueError('deadline must be positive')
+            monitor = DeadlineMonitor(self, deadline)
+            callback = monitor._wrap(callback)
+        if timing:
+            stats = self._process_timing = ProcessTiming()
+            perf_counter = _time.perf_counter
+            recent = stats._recent
+            size = len(recent)
+
+            @self._callback('JackProcessCallback', error=_FAILURE)
+            def callback_wrapper(frames, _):
+                start = perf_counter()
+                try:
+                    callback(frames)
+                except CallbackExit:
+                    return _FAILURE
+                finally:
+                    duration = perf_counter() - start
+                    recent[stats.count % size] = duration
+                    stats.count += 1
+                    stats.total += duration
+                    stats.last = duration
+                    if duration > stats.max:
+                        stats.max = duration
+                    if duration > stats._peak:
+                        stats._peak = duration
+                return _SUCCESS
+        else:
+            self._process_timing = None
+
+            @self._callback('JackProcessCallback', error=_FAILURE)
+            def callback_wrapper(frames, _):
+                try:
+                    callback(frames)
+                except CallbackExit:
+                    return _FAILURE
+                return _SUCCESS
 
         _check(_lib.jack_set_process_callback(
             self._ptr, callback_wrapper, _ffi.NULL),
             'Error setting process callback')
+        if monitor is not None:
+            monitor._start()
+            self._deadline_monitor = monitor
+
+    @property
+    def process_timing(self):
+        """Durations of the process callback (or ``None``).
+
+        This is only available after ``set_process_callback(...,
+        timing=True)``, see `ProcessTiming`.
+
+        """
+        return self._process_timing
+
+    @property
+    def deadline_monitor(self):
+        """Detector for slow process callbacks (or ``None``).
+
+        This is only available after ``set_process_callback(...,
+        deadline=...)``, see `DeadlineMonitor`.
+
+        """
+        return self._deadline_monitor
 
     def set_freewheel_callback(self, callback):
         """Register freewheel callback.
@@ -895,6 +1243,7 @@ class Client:
         """
         @self._callback('JackBufferSizeCallback', error=_FAILURE)
         def callback_wrapper(blocksize, _):
+            self._notify('blocksize', blocksize)
             try:
                 callback(blocksize)
             except CallbackExit:
@@ -939,6 +1288,7 @@ class Client:
         """
         @self._callback('JackSampleRateCallback', error=_FAILURE)
         def callback_wrapper(samplerate, _):
+            self._notify('samplerate', samplerate)
             try:
                 callback(samplerate)
             except CallbackExit:
@@ -980,7 +1330,9 @@ class Client:
         """
         @self._callback('JackClientRegistrationCallback')
         def callback_wrapper(name, register, _):
-            callback(_decode(name), bool(register))
+            name, register = _decode(name), bool(register)
+            self._notify('client_registration', name, register)
+            callback(name, register)
 
         _check(_lib.jack_set_client_registration_callback(
             self._ptr, callback_wrapper, _ffi.NULL),
@@ -1046,13 +1398,9 @@ class Client:
 
         @self._callback('JackPortRegistrationCallback')
         def callback_wrapper(port_id, register, _):
-            port_ptr = _lib.jack_port_by_id(self._ptr, port_id)
-            if port_ptr:
-                port = self._wrap_port_ptr(port_ptr)
-            elif only_available:
+            port = self._port_registration(port_id, register)
+            if port is None and only_available:
                 return
-            else:
-                port = None
             callback(port, bool(register))
 
         _check(_lib.jack_set_port_registration_callback(
@@ -1116,10 +1464,10 @@ class Client:
 
         @self._callback('JackPortConnectCallback')
         def callback_wrapper(a, b, connect, _):
-            port_ids = a, b
+            ptrs = self._port_connect(a, b, connect)
             ports = [None, None]
             for idx in 0, 1:
-                ptr = _lib.jack_port_by_id(self._ptr, port_ids[idx])
+                ptr = ptrs[idx]
                 if ptr:
                     ports[idx] = self._wrap_port_ptr(ptr)
                 elif only_available:
@@ -1182,7 +1530,8 @@ class Client:
 
         @self._callback('JackPortRenameCallback', error=_FAILURE)
         def callback_wrapper(port_id, old_name, new_name, _):
-            port_ptr = _lib.jack_port_by_id(self._ptr, port_id)
+            port_ptr, old_name, new_name = self._port_rename(
+                port_id, old_name, new_name)
             if port_ptr:
                 port = self._wrap_port_ptr(port_ptr)
             elif only_available:
@@ -1190,7 +1539,7 @@ class Client:
             else:
                 port = None
             try:
-                callback(port, _decode(old_name), _decode(new_name))
+                callback(port, old_name, new_name)
             except CallbackExit:
                 return _FAILURE
             return _SUCCESS
@@ -1229,6 +1578,7 @@ class Client:
         """
         @self._callback('JackGraphOrderCallback', error=_FAILURE)
         def callback_wrapper(_):
+            self._notify('graph_order')
             try:
                 callback()
             except CallbackExit:
@@ -1239,6 +1589,52 @@ class Client:
             self._ptr, callback_wrapper, _ffi.NULL),
             'Error setting graph order callback')
 
+    def set_graph_change_callback(self, callback, interval=None):
+        """Register a callback for batches of graph changes.
+
+        Port registrations, connections and renames are collected and
+        delivered as one `GraphChange` object per batch, which is much
+        cheaper than handling each notification separately (e.g. when
+        a client with many ports is started).
+
+        Opposed to the other ``set_*_callback()`` methods, this can
+        also be called while the client is activated.  There can be
+        only one graph change callback, a new one replaces the old one.
+
+        Parameters
+        ----------
+        callback : callable or None
+            User-supplied function that is called with each non-empty
+            batch of changes.  It must have this signature::
+
+                callback(changes: GraphChange) -> None
+
+            Use ``None`` to stop the notifications.
+        interval : float, optional
+            If not given, a batch is delivered whenever the processing
+            graph is reordered, which JACK does after each change of
+            connections.  The callback is then called from JACK's
+            notification thread and, same as with most callbacks, no
+            functions that interact with the JACK daemon should be used
+            there.  Port registrations without connection changes are
+            held back until the next reordering.
+
+            If a time (in seconds) is given, a batch is delivered every
+            *interval* seconds from a separate thread, where all JACK
+            functions can be used.
+
+        See Also
+        --------
+        set_port_registration_callback, set_port_connect_callback,
+        set_port_rename_callback, set_graph_order_callback
+
+        """
+        if self._graph_changes is not None:
+            self._graph_changes.stop()
+            self._graph_changes = None
+        if callback is not None:
+            self._graph_changes = _GraphChangeBatcher(self, callback, interval)
+
     def set_xrun_callback(self, callback):
         """Register xrun callback.
 
@@ -1270,8 +1666,10 @@ class Client:
         """
         @self._callback('JackXRunCallback', error=_FAILURE)
         def callback_wrapper(_):
+            delayed_usecs = _lib.jack_get_xrun_delayed_usecs(self._ptr)
+            self._notify('xrun', delayed_usecs)
             try:
-                callback(_lib.jack_get_xrun_delayed_usecs(self._ptr))
+                callback(delayed_usecs)
             except CallbackExit:
                 return _FAILURE
             return _SUCCESS
@@ -1477,7 +1875,9 @@ class Client:
         """
         @self._callback('JackPropertyChangeCallback')
         def callback_wrapper(subject, key, change, _):
-            callback(subject, _decode(key) if key else '', change)
+            key = _decode(key) if key else ''
+            self._notify('property_change', subject, key, change)
+            callback(subject, key, change)
 
         _check(_lib.jack_set_property_change_callback(
             self._ptr, callback_wrapper, _ffi.NULL),
@@ -1651,6 +2051,100 @@ class Client:
             raise ValueError('Unable to set property {!r} for subject {!r}'
                              .format(key, subject))
 
+    def set_properties(self, entries):
+        """Set many metadata properties at once.
+
+        This is faster than calling `set_property()` repeatedly, because
+        UUIDs, keys and types are parsed and encoded only once.
+        All entries are tried, even if some of them fail.
+
+        Parameters
+        ----------
+        entries : iterable of tuple or dict
+            ``(subject, key, value)`` or ``(subject, key, value, type)``
+            tuples, see `set_property()`.  Alternatively, a dictionary
+            mapping ``(subject, key)`` tuples to *value* or to
+            ``(value, type)`` tuples.
+
+        Returns
+        -------
+        list of ((subject, key), Exception)
+            The entries that could not be set, together with the error.
+
+        See Also
+        --------
+        set_property, unset_properties
+
+        """
+        if hasattr(entries, 'items'):
+            entries = (
+                (subject, key, *(value if isinstance(value, tuple)
+                                 else (value,)))
+                for (subject, key), value in entries.items())
+        encode = _Encoder()
+        errors = []
+        for subject, key, value, *type in entries:
+            try:
+                uuid = _uuid_parse(subject)
+            except (TypeError, ValueError) as e:
+                errors.append(((subject, key), e))
+                continue
+            if isinstance(value, str):
+                value = value.encode()
+            try:
+                result = _lib.jack_set_property(
+                    self._ptr, uuid, encode(key), value,
+                    encode(type[0] if type else ''))
+            except TypeError as e:
+                errors.append(((subject, key), e))
+                continue
+            if result != 0:
+                errors.append(((subject, key), ValueError(
+                    f'Unable to set property {key!r} for subject {uuid!r}')))
+        return errors
+
+    def unset_properties(self, entries):
+        """Remove many metadata properties at once.
+
+        All entries are tried, even if some of them fail.
+
+        Parameters
+        ----------
+        entries : iterable of (subject, key)
+            Subjects and keys of the properties to be removed, see
+            `remove_property()`.
+
+        Returns
+        -------
+        list of ((subject, key), Exception)
+            The entries that could not be removed, together with the
+            error.
+
+        See Also
+        --------
+        remove_property, set_properties
+
+        """
+        encode = _Encoder()
+        errors = []
+        for subject, key in entries:
+            try:
+                uuid = _uuid_parse(subject)
+            except (TypeError, ValueError) as e:
+                errors.append(((subject, key), e))
+                continue
+            try:
+                result = _lib.jack_remove_property(
+                    self._ptr, uuid, encode(key))
+            except TypeError as e:
+                errors.append(((subject, key), e))
+                continue
+            if result != 0:
+                errors.append(((subject, key), ValueError(
+                    f'Unable to remove property {key!r} for subject {uuid!r}'
+                )))
+        return errors
+
     def remove_property(self, subject, key):
         """Remove a single metadata property on *subject*.
 
@@ -1735,6 +2229,144 @@ class Client:
         if _lib.jack_remove_all_properties(self._ptr) != 0:
             raise RuntimeError('Unable to remove properties')
 
+    def graph_snapshot(self, live=False):
+        """Get information about all ports and connections at once.
+
+        This is much faster than combining `get_ports()` and
+        `get_all_connections()`, because no `Port` objects are created
+        and the connections are only queried for output ports.
+
+        Parameters
+        ----------
+        live : bool, optional
+            If ``True``, the snapshot is kept up-to-date (from the port
+            registration, connection and rename notifications) until
+            :meth:`GraphSnapshot.close` is called.
+            This only works while the client is active.
+
+        Returns
+        -------
+        GraphSnapshot
+
+        """
+        return GraphSnapshot(self, live)
+
+    def connection_matrix(self, sources, destinations, sparse=False):
+        """Get the connections between two groups of ports as a matrix.
+
+        This needs one query per source port, no `Port` objects are
+        created for the connected ports.
+
+        Make sure to ``import numpy`` before calling this, otherwise the
+        first call might take a long time.
+
+        Parameters
+        ----------
+        sources, destinations : sequence of (str or Port)
+            Full port names or port objects.  Normally, *sources* are
+            output ports and *destinations* are input ports, but the
+            connections are checked in both directions.
+        sparse : bool, optional
+            If ``True``, a ``scipy.sparse.csr_matrix`` is returned
+            (SciPy must be installed for this to work).
+
+        Returns
+        -------
+        numpy.ndarray or scipy.sparse.csr_matrix
+            Boolean matrix with one row per source and one column per
+            destination, which is ``True`` where the two ports are
+            connected.
+
+        See Also
+        --------
+        get_all_connections
+
+        """
+        import numpy as np
+        destinations = list(destinations)
+        columns = {}  # A port may appear more than once
+        for idx, port in enumerate(destinations):
+            if isinstance(port, Port):
+                port = port.name
+            columns.setdefault(port.encode(), []).append(idx)
+        indptr = [0]
+        indices = []
+        for port in sources:
+            port_ptr = self._get_port_ptr(port)
+            names = _ffi.gc(_lib.jack_port_get_all_connections(
+                self._ptr, port_ptr), _lib.jack_free)
+            row = []
+            idx = 0
+            while names:
+                name = names[idx]
+                if not name:
+                    break
+                row.extend(columns.get(_ffi.string(name), ()))
+                idx += 1
+            indices.extend(sorted(row))
+            indptr.append(len(indices))
+        shape = len(indptr) - 1, len(destinations)
+        if sparse:
+            from scipy.sparse import csr_matrix
+            return csr_matrix((np.ones(len(indices), dtype=bool),
+                               np.array(indices, dtype=np.intp),
+                               np.array(indptr, dtype=np.intp)), shape=shape)
+        matrix = np.zeros(shape, dtype=bool)
+        rows = np.repeat(np.arange(shape[0]), np.diff(indptr))
+        matrix[rows, indices] = True
+        return matrix
+
+    def port_index(self):
+        """Get a client-side index of all port names.
+
+        The index is kept up-to-date from the port registration and
+        rename notifications, which only works while the client is
+        active.  It can be used to look up ports by prefix, glob
+        pattern or regular expression without asking the JACK server.
+
+        Returns
+        -------
+        PortIndex
+
+        See Also
+        --------
+        get_ports
+
+        """
+        return PortIndex(self)
+
+    def metadata_cache(self, preload=False):
+        """Get a client-side cache of metadata properties.
+
+        Properties are queried from the JACK server when they are first
+        requested and then kept until a property change notification
+        invalidates them.  Notifications are only received while the
+        client is active.
+
+        Parameters
+        ----------
+        preload : bool, optional
+            If ``True``, all properties are loaded at once (see
+            `MetadataCache.load()`).
+
+        Returns
+        -------
+        MetadataCache
+
+        Raises
+        ------
+        JackError
+            If property change notifications are not available.
+
+        See Also
+        --------
+        get_property, get_properties, set_property_change_callback
+
+        """
+        if not self._property_notifications:
+            raise JackError('Property change notifications not available')
+        return MetadataCache(self, preload)
+
     def _callback(self, cdecl, **kwargs):
         """Wrapper for ffi.callback() that keeps callback alive."""
         def callback_decorator(python_callable):
@@ -1767,14 +2399,16 @@ class Client:
     def _port_list_from_pointers(self, names):
         """Get list of Port objects from char**."""
         ports = []
-        if names:
-            idx = 0
-            while True:
-                name = names[idx]
-                if not name:
-                    break
-                ports.append(self.get_port_by_name(_decode(name)))
-                idx += 1
+        idx = 0
+        while names:
+            name = names[idx]
+            if not name:
+                break
+            port_ptr = _lib.jack_port_by_name(self._ptr, name)
+            if not port_ptr:
+                raise JackError(f'Port {_decode(name)!r} not available')
+            ports.append(self._wrap_port_ptr(port_ptr))
+            idx += 1
         return ports
 
     def _get_port_ptr(self, port):
@@ -1786,7 +2420,15 @@ class Client:
         return port
 
     def _wrap_port_ptr(self, ptr):
-        """Create appropriate port object for a given port pointer."""
+        """Create appropriate port object for a given port pointer.
+
+        While the client is active, port objects are cached.  The cache
+        is kept up-to-date by the port registration callback.
+
+        """
+        port = self._port_cache.get(ptr)
+        if port is not None:
+            return port
         porttype = _ffi.string(_lib.jack_port_type(ptr))
         if porttype == _AUDIO:
             cls = OwnPort if self.owns(ptr) else Port
@@ -1794,43 +2436,221 @@ class Client:
             cls = OwnMidiPort if self.owns(ptr) else MidiPort
         else:
             cls = UnknownPort
-        return cls(ptr, self)
+        port = cls(ptr, self)
+        if self._active:
+            self._port_cache[ptr] = port
+        return port
 
+    def _set_internal_callbacks(self):
+        """Register callbacks needed for caching, GraphSnapshot etc.
 
-class Port:
-    """A JACK audio port.
+        If the user registers the same kinds of callbacks, the
+        replacements do the same work (before calling the user code).
 
-    This class cannot be instantiated directly.  Instead, instances of
-    this class are returned from `Client.get_port_by_name()`,
-    `Client.get_ports()`, `Client.get_all_connections()` and
-    `OwnPort.connections`.
-    In addition, instances of this class are available in the callbacks
-    which are set with `Client.set_port_registration_callback()`,
-    `Client.set_port_connect_callback()` or
-    `Client.set_port_rename_callback`.
+        """
+        @self._callback('JackPortRegistrationCallback')
+        def port_registration_callback(port_id, register, _):
+            self._port_registration(port_id, register)
 
-    Note, however, that if the used `Client` owns the respective port,
-    instances of `OwnPort` (instead of `Port`) will be created.  In case
-    of MIDI ports, instances of `MidiPort` or `OwnMidiPort` are created.
+        _lib.jack_set_port_registration_callback(
+            self._ptr, port_registration_callback, _ffi.NULL)
 
-    Besides being the type of non-owned JACK audio ports, this class
-    also serves as base class for all other port classes (`OwnPort`,
-    `MidiPort` and `OwnMidiPort`).
+        @self._callback('JackPortConnectCallback')
+        def port_connect_callback(a, b, connect, _):
+            self._port_connect(a, b, connect)
 
-    New JACK audio/MIDI ports can be created with the
-    :meth:`~Ports.register` method of `Client.inports`,
-    `Client.outports`, `Client.midi_inports` and `Client.midi_outports`.
+        _lib.jack_set_port_connect_callback(
+            self._ptr, port_connect_callback, _ffi.NULL)
 
-    """
+        @self._callback('JackPortRenameCallback', error=_FAILURE)
+        def port_rename_callback(port_id, old_name, new_name, _):
+            self._port_rename(port_id, old_name, new_name)
+            return _SUCCESS
 
-    def __init__(self, port_ptr, client):
-        self._ptr = port_ptr
-        self._client = client
+        self._rename_notifications = False
+        try:
+            set_port_rename_callback = _lib.jack_set_port_rename_callback
+        except AttributeError:
+            pass  # Not available in JACK 1
+        else:
+            self._rename_notifications = not set_port_rename_callback(
+                self._ptr, port_rename_callback, _ffi.NULL)
 
-    def __repr__(self):
-        return "jack.{0.__class__.__name__}('{0.name}')".format(self)
+        @self._callback('JackBufferSizeCallback', error=_FAILURE)
+        def blocksize_callback(blocksize, _):
+            self._notify('blocksize', blocksize)
+            return _SUCCESS
 
-    def __eq__(self, other):
+        _lib.jack_set_buffer_size_callback(
+            self._ptr, blocksize_callback, _ffi.NULL)
+
+        @self._callback('JackSampleRateCallback', error=_FAILURE)
+        def samplerate_callback(samplerate, _):
+            self._notify('samplerate', samplerate)
+            return _SUCCESS
+
+        _lib.jack_set_sample_rate_callback(
+            self._ptr, samplerate_callback, _ffi.NULL)
+
+        @self._callback('JackGraphOrderCallback', error=_FAILURE)
+        def graph_order_callback(_):
+            self._notify('graph_order')
+            return _SUCCESS
+
+        _lib.jack_set_graph_order_callback(
+            self._ptr, graph_order_callback, _ffi.NULL)
+
+        @self._callback('JackClientRegistrationCallback')
+        def client_registration_callback(name, register, _):
+            self._notify('client_registration', _decode(name), bool(register))
+
+        _lib.jack_set_client_registration_callback(
+            self._ptr, client_registration_callback, _ffi.NULL)
+
+        @self._callback('JackXRunCallback', error=_FAILURE)
+        def xrun_callback(_):
+            self._notify('xrun', _lib.jack_get_xrun_delayed_usecs(self._ptr))
+            return _SUCCESS
+
+        _lib.jack_set_xrun_callback(self._ptr, xrun_callback, _ffi.NULL)
+
+        @self._callback('JackInfoShutdownCallback')
+        def shutdown_callback(code, reason, _):
+            self._notify('shutdown', Status(code), _decode(reason))
+
+        _lib.jack_on_info_shutdown(self._ptr, shutdown_callback, _ffi.NULL)
+
+        @self._callback('JackPropertyChangeCallback')
+        def property_change_callback(subject, key, change, _):
+            self._notify('property_change', subject,
+                         _decode(key) if key else '', change)
+
+        self._property_notifications = False
+        try:
+            set_property_change_callback = \
+                _lib.jack_set_property_change_callback
+        except AttributeError:
+            pass  # Not available in old JACK versions
+        else:
+            self._property_notifications = not set_property_change_callback(
+                self._ptr, property_change_callback, _ffi.NULL)
+
+    def _notify(self, event, *args):
+        """Forward a notification to all internal listeners."""
+        # Listeners may be removed while iterating:
+        for listener in tuple(self._listeners):
+            listener(event, *args)
+
+    def _port_registration(self, port_id, register):
+        """Update port cache, return port object (or None if unavailable)."""
+        port_ptr = _lib.jack_port_by_id(self._ptr, port_id)
+        self._notify('port_registration', port_ptr, bool(register))
+        if not port_ptr:
+            if not register:
+                # We don't know which port is gone:
+                self._port_cache.clear()
+            return None
+        if register:
+            # Own ports are already cached by Ports.register(), other
+            # cached objects may belong to a port whose pointer has been
+            # re-used:
+            if not self.owns(port_ptr):
+                self._port_cache.pop(port_ptr, None)
+            return self._wrap_port_ptr(port_ptr)
+        port = self._wrap_port_ptr(port_ptr)
+        self._port_cache.pop(port_ptr, None)
+        return port
+
+    def _port_connect(self, a, b, connect):
+        """Return port pointers (which may be NULL) for both port IDs."""
+        ptrs = (_lib.jack_port_by_id(self._ptr, a),
+                _lib.jack_port_by_id(self._ptr, b))
+        self._notify('port_connect', ptrs[0], ptrs[1], bool(connect))
+        return ptrs
+
+    def _port_rename(self, port_id, old_name, new_name):
+        """Return port pointer (or NULL), decoded old and new name."""
+        port_ptr = _lib.jack_port_by_id(self._ptr, port_id)
+        old_name, new_name = _decode(old_name), _decode(new_name)
+        if port_ptr:
+            port = self._port_cache.get(port_ptr)
+            if port is not None:
+                port._name = port._shortname = None
+            if self.owns(port_ptr):
+                prefix = len(old_name) - len(old_name.split(':', 1)[1])
+                self._ports_of(port_ptr)._rename(
+                    port_ptr, old_name[prefix:], new_name[prefix:])
+        self._notify('port_rename', port_ptr, old_name, new_name)
+        return port_ptr, old_name, new_name
+
+    def _names_cached(self, port):
+        """Check if the cached name of a port object is up-to-date.
+
+        This is only the case for cached port objects and only if rename
+        notifications are available.
+
+        """
+        return (self._rename_notifications
+                and self._port_cache.get(port._ptr) is port)
+
+    def _ports_of(self, port_ptr):
+        """Get the Ports object an own port belongs to."""
+        flags = _lib.jack_port_flags(port_ptr)
+        if _ffi.string(_lib.jack_port_type(port_ptr)) == _MIDI:
+            if flags & _lib.JackPortIsInput:
+                return self._midi_inports
+            return self._midi_outports
+        if flags & _lib.JackPortIsInput:
+            return self._inports
+        return self._outports
+
+
+class Port:
+    """A JACK audio port.
+
+    This class cannot be instantiated directly.  Instead, instances of
+    this class are returned from `Client.get_port_by_name()`,
+    `Client.get_ports()`, `Client.get_all_connections()` and
+    `OwnPort.connections`.
+    In addition, instances of this class are available in the callbacks
+    which are set with `Client.set_port_registration_callback()`,
+    `Client.set_port_connect_callback()` or
+    `Client.set_port_rename_callback`.
+
+    Note, however, that if the used `Client` owns the respective port,
+    instances of `OwnPort` (instead of `Port`) will be created.  In case
+    of MIDI ports, instances of `MidiPort` or `OwnMidiPort` are created.
+
+    While the `Client` is active, port objects are cached, i.e. the
+    same object is returned each time the same JACK port is requested.
+
+    Besides being the type of non-owned JACK audio ports, this class
+    also serves as base class for all other port classes (`OwnPort`,
+    `MidiPort` and `OwnMidiPort`).
+
+    New JACK audio/MIDI ports can be created with the
+    :meth:`~Ports.register` method of `Client.inports`,
+    `Client.outports`, `Client.midi_inports` and `Client.midi_outports`.
+
+    """
+
+    __slots__ = ('_ptr', '_client', '_type', '_flags', '_uuid', '_name',
+                 '_shortname')
+
+    def __init__(self, port_ptr, client):
+        self._ptr = port_ptr
+        self._client = client
+        # These never change for a given port:
+        self._type = _decode(_lib.jack_port_type(port_ptr))
+        self._flags = _lib.jack_port_flags(port_ptr)
+        self._uuid = _lib.jack_port_uuid(port_ptr)
+        # These are cached as long as rename notifications are received:
+        self._name = self._shortname = None
+
+    def __repr__(self):
+        return "jack.{0.__class__.__name__}('{0.name}')".format(self)
+
+    def __eq__(self, other):
         """Ports are equal if their underlying port pointers are."""
         return self._ptr == other._ptr
 
@@ -1841,7 +2661,9 @@ class Port:
     @property
     def name(self):
         """Full name of the JACK port (read-only)."""
-        return _decode(_lib.jack_port_name(self._ptr))
+        if self._name is None or not self._client._names_cached(self):
+            self._name = _decode(_lib.jack_port_name(self._ptr))
+        return self._name
 
     @property
     def shortname(self):
@@ -1854,28 +2676,26 @@ class Port:
         `port_name_size()`, it will be truncated.
 
         """
-        return _decode(_lib.jack_port_short_name(self._ptr))
+        if self._shortname is None or not self._client._names_cached(self):
+            self._shortname = _decode(_lib.jack_port_short_name(self._ptr))
+        return self._shortname
 
     @shortname.setter
     def shortname(self, shortname):
+        old = self.shortname
         _check(_lib.jack_port_rename(self._client._ptr, self._ptr,
                                      shortname.encode()),
                'Error setting port name')
+        self._name = self._shortname = None
+        if self._client.owns(self._ptr):
+            # In case the rename notification didn't already do this:
+            self._client._ports_of(self._ptr)._rename(
+                self._ptr, old, self.shortname)
 
     @property
     def aliases(self):
         """Returns a list of strings with the aliases for the JACK port."""
-        ctype = f'char[{_lib.jack_port_name_size()}]'
-        aliases = [_ffi.new(ctype), _ffi.new(ctype)]
-        aliasesptr = _ffi.new('char *[]', aliases)
-        result = []
-        if _lib.jack_port_get_aliases(self._ptr, aliasesptr) > 0:
-            for i in 0, 1:
-                alias = _decode(aliases[i])
-                if alias:
-                    result.append(alias)
-
-        return result
+        return _get_aliases(self._ptr)
 
     def set_alias(self, alias):
         """Set an alias for the JACK port.
@@ -1899,12 +2719,12 @@ class Port:
     @property
     def type(self):
         """Name of the JACK port type (read-only)."""
-        return _decode(_lib.jack_port_type(self._ptr))    
+        return self._type
 
     @property
     def uuid(self):
         """The UUID of the JACK port."""
-        return _lib.jack_port_uuid(self._ptr)
+        return self._uuid
 
     is_audio = property(lambda self: True, doc='This is always ``True``.')
     is_midi = property(lambda self: False, doc='This is always ``False``.')
@@ -1952,7 +2772,7 @@ class Port:
 
     def _hasflag(self, flag):
         """Helper method for is_*()."""
-        return bool(_lib.jack_port_flags(self._ptr) & flag)
+        return bool(self._flags & flag)
 
 
 class MidiPort(Port):
@@ -1973,17 +2793,21 @@ class MidiPort(Port):
 
     """
 
+    __slots__ = ()
+
     is_audio = property(lambda self: False, doc='This is always ``False``.')
     is_midi = property(lambda self: True, doc='This is always ``True``.')
 
 
 class UnknownPort(Port):
     """A JACK port with an unknown type
-    
+
     This class is derived from `Port` and has exactly the same
     attributes and methods.
     """
 
+    __slots__ = ()
+
     is_audio = property(lambda self: False, doc='This is always ``False``.')
     is_midi = property(lambda self: False, doc='This is always ``False``.')
 
@@ -2002,6 +2826,8 @@ class OwnPort(Port):
 
     """
 
+    __slots__ = ()
+
     @property
     def number_of_connections(self):
         """Number of connections to or from port."""
@@ -2085,16 +2911,12 @@ class OwnPort(Port):
         `Client.midi_outports`.
 
         """
-        if self.is_audio:
-            listname = ''
-        elif self.is_midi:
-            listname = 'midi_'
-        if self.is_input:
-            listname += 'inports'
-        elif self.is_output:
-            listname += 'outports'
-        ports = getattr(self._client, listname)
-        ports._portlist.remove(self)
+        self._client._ports_of(self._ptr)._remove(self._ptr)
+        self._unregister()
+
+    def _unregister(self):
+        """Unregister without removing from Client.*ports."""
+        self._client._port_cache.pop(self._ptr, None)
         _check(_lib.jack_port_unregister(self._client._ptr, self._ptr),
                f'Error unregistering {self.name!r}')
 
@@ -2156,6 +2978,8 @@ class OwnMidiPort(MidiPort, OwnPort):
 
     """
 
+    __slots__ = '_event'
+
     def __init__(self, *args, **kwargs):
         OwnPort.__init__(self, *args, **kwargs)
         self._event = _ffi.new('jack_midi_event_t*')
@@ -2309,10 +3133,14 @@ class Ports:
     used as `Client.inports`, `Client.outports`, `Client.midi_inports`
     and `Client.midi_outports`.
 
-    The ports can be accessed by indexing or by iteration.
+    The ports can be accessed by iteration, by (integer) indexing or by
+    their short name, e.g. ``client.outports['out_17']``.  Lookups by
+    short name are constant time.
 
     New ports can be added with `register()`, existing ports can be
     removed by calling their :meth:`~OwnPort.unregister` method.
+    When a port is removed, the indices of all subsequent ports are
+    decremented.
 
     """
 
@@ -2320,21 +3148,59 @@ class Ports:
         self._client = client
         self._type = porttype
         self._flag = flag
-        self._portlist = []
+        self._portdict = {}  # short name -> port, in order of registration
+        self._portlist = []  # cached list of ports, None if outdated
 
     def __len__(self):
-        return self._portlist.__len__()
+        return self._portdict.__len__()
 
     def __getitem__(self, name):
-        return self._portlist.__getitem__(name)
+        if isinstance(name, str):
+            return self._portdict[name]
+        return self._list().__getitem__(name)
 
     # No __setitem__!
 
     def __iter__(self):
-        return self._portlist.__iter__()
+        return self._list().__iter__()
+
+    def __contains__(self, port):
+        if isinstance(port, str):
+            return port in self._portdict
+        return port in self._list()
 
     def __repr__(self):
-        return self._portlist.__repr__()
+        return self._list().__repr__()
+
+    def _list(self):
+        if self._portlist is None:
+            self._portlist = list(self._portdict.values())
+        return self._portlist
+
+    def _add(self, shortname, port):
+        self._portdict[shortname] = port
+        self._portlist = None
+
+    def _remove(self, port_ptr):
+        """Remove port from dict, raise ValueError if not found."""
+        shortname = _decode(_lib.jack_port_short_name(port_ptr))
+        port = self._portdict.get(shortname)
+        if port is None or port._ptr != port_ptr:
+            # The port may have been renamed without notification:
+            for shortname, port in self._portdict.items():
+                if port._ptr == port_ptr:
+                    break
+            else:
+                raise ValueError('Port not in list')
+        del self._portdict[shortname]
+        self._portlist = None
+
+    def _rename(self, port_ptr, old, new):
+        """Change the short name of a port (if it is in the list)."""
+        port = self._portdict.get(old)
+        if port is not None and port._ptr == port_ptr:
+            self._portdict = {new if key == old else key: value
+                              for key, value in self._portdict.items()}
 
     def register(self, shortname, is_terminal=False, is_physical=False):
         """Create a new input/output port.
@@ -2377,9 +3243,61 @@ class Ports:
         """
         port = self._client._register_port(
             shortname, self._type, is_terminal, is_physical, self._flag)
-        self._portlist.append(port)
+        self._add(shortname, port)
         return port
 
+    def register_many(self, shortnames, count=None, is_terminal=False,
+                      is_physical=False):
+        """Create many input/output ports at once.
+
+        This is faster than calling `register()` repeatedly.
+        If one of the ports cannot be registered, the ports that have
+        already been registered by this call are unregistered again.
+
+        Parameters
+        ----------
+        shortnames : str or iterable of str
+            Either a list of short names (see `register()`) or a
+            string containing ``{}``, which is replaced by the numbers
+            from 1 to *count*, e.g. ``'out_{}'``.
+        count : int, optional
+            Number of ports, only used if *shortnames* is a string.
+        is_terminal, is_physical : bool
+            See `register()`.
+
+        Returns
+        -------
+        PortArray
+            The new `OwnPort` or `OwnMidiPort` instances, which are also
+            added to this list.
+
+        """
+        if isinstance(shortnames, str):
+            if count is None:
+                raise TypeError('count is required if shortnames is a string')
+            shortnames = [shortnames.format(i + 1) for i in range(count)]
+        else:
+            shortnames = list(shortnames)
+        flags = self._flag
+        if is_terminal:
+            flags |= _lib.JackPortIsTerminal
+        if is_physical:
+            flags |= _lib.JackPortIsPhysical
+        client = self._client
+        ports = [None] * len(shortnames)
+        for idx, name in enumerate(shortnames):
+            port_ptr = _lib.jack_port_register(
+                client._ptr, name.encode(), self._type, flags, 0)
+            if not port_ptr:
+                for port in ports[:idx]:
+                    port._unregister()
+                raise JackError(f'{name!r}: port registration failed')
+            ports[idx] = client._wrap_port_ptr(port_ptr)
+        for name, port in zip(shortnames, ports):
+            self._portdict[name] = port
+        self._portlist = None
+        return PortArray(ports, client)
+
     def clear(self):
         """Unregister all ports in the list.
 
@@ -2388,388 +3306,3778 @@ class Ports:
         OwnPort.unregister
 
         """
-        while self._portlist:
-            self._portlist[0].unregister()
+        while self._portdict:
+            _, port = self._portdict.popitem()
+            self._portlist = None
+            port._unregister()
 
 
-class RingBuffer:
-    """JACK's lock-free ringbuffer."""
+class PortArray:
+    """A fixed group of ports, as returned by `Ports.register_many()`.
 
-    def __init__(self, size):
-        """Create a lock-free ringbuffer.
+    The ports can be accessed by indexing or by iteration.  For audio
+    ports, the buffers of all ports can be accessed at once with
+    `read()` and `write()`.
 
-        A ringbuffer is a good way to pass data between threads
-        (e.g. between the main program and the process callback),
-        when streaming realtime data to slower media, like audio file
-        playback or recording.
+    """
 
-        The key attribute of a ringbuffer is that it can be safely
-        accessed by two threads simultaneously -- one reading from the
-        buffer and the other writing to it -- without using any
-        synchronization or mutual exclusion primitives.  For this to
-        work correctly, there can only be a single reader and a single
-        writer thread.  Their identities cannot be interchanged.
+    def __init__(self, ports, client):
+        self._ports = ports
+        self._ptrs = [port._ptr for port in ports]
+        self._client = client
 
-        Parameters
-        ----------
-        size : int
-            Size in bytes.  JACK will allocate a buffer of at least this
-            size (rounded up to the next power of 2), but one byte is
-            reserved for internal use.  Use `write_space` to
-            determine the actual size available for writing.
+    def __len__(self):
+        return len(self._ports)
 
+    def __getitem__(self, index):
+        return self._ports[index]
 
-        Raises
-        ------
-        JackError
-            If the rightbufefr could not be allocated.
+    def __iter__(self):
+        return iter(self._ports)
 
-        """
-        ptr = _lib.jack_ringbuffer_create(size)
-        if not ptr:
-            raise JackError('Could not create RingBuffer')
-        self._ptr = _ffi.gc(ptr, _lib.jack_ringbuffer_free)
+    def __repr__(self):
+        return f'jack.PortArray({self._ports!r})'
 
-    @property
-    def write_space(self):
-        """The number of bytes available for writing."""
-        return _lib.jack_ringbuffer_write_space(self._ptr)
+    def read(self, out=None):
+        """Copy the buffers of all ports into a NumPy array.
 
-    def write(self, data):
-        """Write data into the ringbuffer.
+        This method shall only be called from within the process
+        callback (see `Client.set_process_callback()`).
 
         Parameters
         ----------
-        data : buffer or bytes or iterable of int
-            Bytes to be written to the ringbuffer.
+        out : numpy.ndarray, optional
+            A C-contiguous ``float32`` array with the shape
+            ``(len(self), blocksize)``.  If not given, a new array is
+            created.  Passing a pre-allocated array avoids memory
+            allocation in the process callback.
 
         Returns
         -------
-        int
-            The number of bytes written, which could be less than the
-            length of *data* if there was no more space left
-            (see `write_space`).
+        numpy.ndarray
+            One row per port.
 
-        See Also
-        --------
-        :attr:`write_space`, :attr:`write_buffers`
+        """
+        self._check_audio()
+        import numpy as np
+        blocksize = self._client.blocksize
+        shape = len(self._ptrs), blocksize
+        if out is None:
+            out = np.empty(shape, dtype=np.float32)
+        elif (out.dtype != np.float32 or out.shape != shape or
+                not out.flags.c_contiguous):
+            raise ValueError(
+                f'out must be a C-contiguous float32 array of shape {shape}')
+        nbytes = blocksize * 4
+        for row, port_ptr in zip(out, self._ptrs):
+            _ffi.memmove(row, _lib.jack_port_get_buffer(port_ptr, blocksize),
+                         nbytes)
+        return out
+
+    def write(self, data):
+        """Copy data from a NumPy array into the buffers of all ports.
+
+        This method shall only be called from within the process
+        callback (see `Client.set_process_callback()`).
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            An array with the shape ``(len(self), blocksize)``, one row
+            per port.  A one-dimensional array with *blocksize*
+            elements is written to all ports.
+            To avoid copies, it should be a C-contiguous ``float32``
+            array.
 
         """
-        try:
-            data = _ffi.from_buffer(data)
-        except AttributeError:
-            pass  # from_buffer() not supported
-        except TypeError:
-            pass  # input is not a buffer
-        return _lib.jack_ringbuffer_write(self._ptr, data, len(data))
+        self._check_audio()
+        import numpy as np
+        blocksize = self._client.blocksize
+        data = np.ascontiguousarray(data, dtype=np.float32)
+        if data.ndim not in (1, 2) or data.shape[-1] != blocksize:
+            raise ValueError(
+                f'data must be 1- or 2-dimensional with {blocksize} columns')
+        if data.ndim == 1:
+            data = [data] * len(self._ptrs)
+        elif len(data) != len(self._ptrs):
+            raise ValueError('Number of rows must match number of ports')
+        nbytes = blocksize * 4
+        for row, port_ptr in zip(data, self._ptrs):
+            _ffi.memmove(_lib.jack_port_get_buffer(port_ptr, blocksize), row,
+                         nbytes)
+
+    def get_arrays(self):
+        """Get audio buffers of all ports as list of NumPy arrays.
+
+        See `OwnPort.get_array()`.
 
-    @property
-    def write_buffers(self):
-        """Contains two buffer objects that can be written to directly.
+        """
+        return [port.get_array() for port in self._ports]
 
-        Two are needed because the space available for writing may be
-        split across the end of the ringbuffer.  Either of them could be
-        0 length.
+    def _check_audio(self):
+        if self._ports and self._ports[0].is_midi:
+            raise NotImplementedError('Not available on MIDI ports')
 
-        This can be used as a no-copy version of `write()`.
 
-        When finished with writing, `write_advance()` should be used.
+class PortInfo:
+    """Information about a JACK port, as stored in a `GraphSnapshot`.
 
-        .. note:: After an operation that changes the write pointer
-           (`write()`, `write_advance()`, `reset()`), the buffers are no
-           longer valid and one should use this property again to get
-           new ones.
+    Opposed to `Port` objects, the attributes of this class are plain
+    values, which are not updated when the port changes.
 
-        """
-        vectors = _ffi.new('jack_ringbuffer_data_t[2]')
-        _lib.jack_ringbuffer_get_write_vector(self._ptr, vectors)
-        return (
-            _ffi.buffer(vectors[0].buf, vectors[0].len),
-            _ffi.buffer(vectors[1].buf, vectors[1].len)
-        )
+    """
 
-    def write_advance(self, size):
-        """Advance the write pointer.
+    # The values are the docstrings of the attributes:
+    __slots__ = {
+        'name': 'Full name of the port.',
+        'shortname': 'Name of the port without the client name.',
+        'client': 'Name of the client the port belongs to.',
+        'type': 'Name of the port type.  See `Port.type`.',
+        'flags': 'Port flags as ``int``.',
+        'uuid': 'UUID of the port.  See `Port.uuid`.',
+        'aliases': 'Tuple of port aliases.  See `Port.aliases`.',
+    }
+
+    def __init__(self, port_ptr):
+        self.name = _decode(_lib.jack_port_name(port_ptr))
+        self.shortname = _decode(_lib.jack_port_short_name(port_ptr))
+        self.client = self.name[:-len(self.shortname) - 1]
+        self.type = _decode(_lib.jack_port_type(port_ptr))
+        self.flags = _lib.jack_port_flags(port_ptr)
+        self.uuid = _lib.jack_port_uuid(port_ptr)
+        self.aliases = tuple(_get_aliases(port_ptr))
 
-        After data has been written to the ringbuffer using
-        `write_buffers`, use this method to advance the buffer pointer,
-        making the data available for future read operations.
+    def __repr__(self):
+        return f'<jack.PortInfo {self.name!r}>'
 
-        Parameters
-        ----------
-        size : int
-            The number of bytes to advance.
+    is_audio = property(lambda self: self.type == _AUDIO.decode())
+    is_midi = property(lambda self: self.type == _MIDI.decode())
+    is_input = property(lambda self: bool(self.flags & _lib.JackPortIsInput))
+    is_output = property(lambda self: bool(self.flags & _lib.JackPortIsOutput))
+    is_physical = property(
+        lambda self: bool(self.flags & _lib.JackPortIsPhysical))
+    can_monitor = property(
+        lambda self: bool(self.flags & _lib.JackPortCanMonitor))
+    is_terminal = property(
+        lambda self: bool(self.flags & _lib.JackPortIsTerminal))
 
-        """
-        _lib.jack_ringbuffer_write_advance(self._ptr, size)
 
-    @property
-    def read_space(self):
-        """The number of bytes available for reading."""
-        return _lib.jack_ringbuffer_read_space(self._ptr)
+class GraphSnapshot:
+    """Ports and connections of the JACK graph.
 
-    def read(self, size):
-        """Read data from the ringbuffer.
+    This class cannot be instantiated directly, see
+    `Client.graph_snapshot()`.
 
-        Parameters
-        ----------
-        size : int
-            Number of bytes to read.
+    Attributes
+    ----------
+    ports
+        A ``dict`` mapping full port names to `PortInfo` objects.
+    clients
+        A ``dict`` mapping client names to lists of full port names.
+    connections
+        A ``set`` of ``(source, destination)`` tuples of full port
+        names.
+    stale
+        ``True`` if a live snapshot has missed a notification because
+        the port in question was not available anymore.  Use
+        `refresh()` to get up-to-date information.
+    lock
+        A live snapshot is modified from JACK's notification thread.
+        The lock should be held while iterating over its contents.
 
-        Returns
-        -------
-        buffer
-            A buffer object containing the requested data.
-            If no more data is left (see `read_space`), a smaller
-            (or even empty) buffer is returned.
+    """
 
-        See Also
-        --------
-        peek, :attr:`read_space`, :attr:`read_buffers`
+    def __init__(self, client, live):
+        self._client = client
+        self.lock = _threading.RLock()
+        self.ports = {}
+        self.clients = {}
+        self.connections = set()
+        self.stale = False
+        self._names = {}  # port pointer -> port name
+        self._ptrs = {}  # port name -> port pointer
+        self._adjacent = {}  # port name -> set of connected port names
+        self._live = live
+        if live:
+            client._listeners.append(self._update)
+        self.refresh()
 
-        """
-        data = _ffi.new('unsigned char[]', size)
-        size = _lib.jack_ringbuffer_read(self._ptr, data, size)
-        return _ffi.buffer(data, size)
+    def __repr__(self):
+        return '<jack.GraphSnapshot: {} clients, {} ports, {} connections>'\
+            .format(len(self.clients), len(self.ports), len(self.connections))
 
-    def peek(self, size):
-        """Peek at data from the ringbuffer.
+    def __enter__(self):
+        return self
 
-        Opposed to `read()` this function does not move the read
-        pointer.  Thus it's a convenient way to inspect data in the
-        ringbuffer in a continuous fashion.
-        The price is that the data is copied into a newly allocated
-        buffer.  For "raw" non-copy inspection of the data in the
-        ringbuffer use `read_buffers`.
+    def __exit__(self, *args):
+        self.close()
+
+    def refresh(self):
+        """Query all information from the JACK server again."""
+        client = self._client
+        with self.lock:
+            self.ports.clear()
+            self.clients.clear()
+            self.connections.clear()
+            self._names.clear()
+            self._ptrs.clear()
+            self._adjacent.clear()
+            self.stale = False
+            names = _ffi.gc(_lib.jack_get_ports(client._ptr, b'', b'', 0),
+                            _lib.jack_free)
+            outputs = []
+            for name in _decode_names(names):
+                port_ptr = _lib.jack_port_by_name(client._ptr, name.encode())
+                if not port_ptr:
+                    continue  # The port has vanished in the meantime
+                info = self._add_port(port_ptr)
+                if info.is_output:
+                    outputs.append((port_ptr, info.name))
+            for port_ptr, source in outputs:
+                names = _ffi.gc(_lib.jack_port_get_all_connections(
+                    client._ptr, port_ptr), _lib.jack_free)
+                for destination in _decode_names(names):
+                    self._add_connection(source, destination)
+
+    def connections_of(self, port):
+        """Get names of all ports connected to *port*.
 
         Parameters
         ----------
-        size : int
-            Number of bytes to peek.
+        port : str or Port or PortInfo
+            Full port name or port object.
 
-        Returns
-        -------
-        buffer
-            A buffer object containing the requested data.
-            If no more data is left (see `read_space`), a smaller
-            (or even empty) buffer is returned.
+        """
+        if not isinstance(port, str):
+            port = port.name
+        with self.lock:
+            return list(self._adjacent.get(port, ()))
 
-        See Also
-        --------
-        read, :attr:`read_space`, :attr:`read_buffers`
+    def close(self):
+        """Stop updating a live snapshot.
+
+        A snapshot can also be used as a *context manager* in a *with
+        statement*, which calls `close()` on exit.
 
         """
-        data = _ffi.new('unsigned char[]', size)
+        if self._live:
+            self._live = False
+            self._client._listeners.remove(self._update)
+
+    def _add_port(self, port_ptr):
+        info = PortInfo(port_ptr)
+        if info.name in self.ports:
+            self._remove_port(info.name)
+        self.ports[info.name] = info
+        self.clients.setdefault(info.client, []).append(info.name)
+        self._names[port_ptr] = info.name
+        self._ptrs[info.name] = port_ptr
+        self._adjacent[info.name] = set()
+        return info
+
+    def _remove_port(self, name):
+        info = self.ports.pop(name)
+        for other in self._adjacent.pop(name):
+            self._adjacent[other].discard(name)
+            self.connections.discard((name, other))
+            self.connections.discard((other, name))
+        client_ports = self.clients[info.client]
+        client_ports.remove(name)
+        if not client_ports:
+            del self.clients[info.client]
+        del self._names[self._ptrs.pop(name)]
+
+    def _add_connection(self, source, destination):
+        if source in self.ports and destination in self.ports:
+            self.connections.add((source, destination))
+            self._adjacent[source].add(destination)
+            self._adjacent[destination].add(source)
+
+    def _rename_port(self, old, new):
+        info = self.ports.pop(old)
+        info.name = new
+        info.shortname = new[len(info.client) + 1:]
+        self.ports[new] = info
+        client_ports = self.clients[info.client]
+        client_ports[client_ports.index(old)] = new
+        port_ptr = self._ptrs.pop(old)
+        self._ptrs[new] = port_ptr
+        self._names[port_ptr] = new
+        others = self._adjacent.pop(old)
+        self._adjacent[new] = others
+        for other in others:
+            self._adjacent[other].discard(old)
+            self._adjacent[other].add(new)
+            if (old, other) in self.connections:
+                self.connections.remove((old, other))
+                self.connections.add((new, other))
+            else:
+                self.connections.remove((other, old))
+                self.connections.add((other, new))
+
+    def _update(self, event, *args):
+        """Listener for notifications from Client."""
+        with self.lock:
+            if event == 'port_registration':
+                port_ptr, register = args
+                if not port_ptr:
+                    self.stale = True
+                elif register:
+                    self._add_port(port_ptr)
+                elif port_ptr in self._names:
+                    self._remove_port(self._names[port_ptr])
+            elif event == 'port_connect':
+                a, b, connect = args
+                if not (a and b and a in self._names and b in self._names):
+                    # Disconnections are already handled on unregistration
+                    self.stale = self.stale or connect
+                    return
+                a, b = self._names[a], self._names[b]
+                if not self.ports[a].is_output:
+                    a, b = b, a
+                if connect:
+                    self._add_connection(a, b)
+                elif (a, b) in self.connections:
+                    self.connections.remove((a, b))
+                    self._adjacent[a].discard(b)
+                    self._adjacent[b].discard(a)
+            elif event == 'port_rename':
+                _, old, new = args
+                if old in self.ports:
+                    self._rename_port(old, new)
+
+
+class GraphChange:
+    """A batch of changes to the JACK graph.
+
+    This class cannot be instantiated directly, see
+    `Client.set_graph_change_callback()`.
+
+    Changes that cancel each other out within one batch (e.g. a port
+    that is registered and unregistered again) are not reported.
+    Connections and disconnections of ports that are unregistered
+    within the batch are not reported either.
+
+    Port names in `added`, `connected` and `disconnected` are the names
+    at the end of the batch, names in `removed` and the old names in
+    `renamed` are the names before the batch.
+
+    """
+
+    # The values are the docstrings of the attributes:
+    __slots__ = {
+        'added': 'List of full names of newly registered ports.',
+        'removed': 'List of full names of unregistered ports.',
+        'connected':
+            'List of ``(source, destination)`` tuples of full port names.',
+        'disconnected':
+            'List of ``(source, destination)`` tuples of full port names.',
+        'renamed': 'List of ``(old, new)`` tuples of full port names.',
+        'incomplete': (
+            '``True`` if some notifications were missed because the port '
+            'in question was not available anymore.  Use '
+            '`Client.graph_snapshot()` to get up-to-date information.'),
+    }
+
+    def __init__(self, events):
+        added = {}
+        removed = {}
+        connected = {}
+        disconnected = {}
+        renamed = {}  # new name -> old name
+        incomplete = False
+        for event in events:
+            if event[0] == 'port_registration':
+                _, name, register = event
+                if name is None:
+                    incomplete = True
+                elif register:
+                    added[name] = None
+                else:
+                    if name in added:
+                        del added[name]
+                    else:
+                        removed[renamed.pop(name, name)] = None
+                    # Connections of removed ports are not reported:
+                    connected = {pair: None for pair in connected
+                                 if name not in pair}
+                    disconnected = {pair: None for pair in disconnected
+                                    if name not in pair}
+            elif event[0] == 'port_connect':
+                _, source, destination, connect = event
+                if source is None or destination is None:
+                    # Disconnections are also implied by unregistration
+                    incomplete = incomplete or connect
+                    continue
+                pair = source, destination
+                if connect:
+                    if pair in disconnected:
+                        del disconnected[pair]
+                    else:
+                        connected[pair] = None
+                elif pair in connected:
+                    del connected[pair]
+                else:
+                    disconnected[pair] = None
+            else:
+                _, old, new = event
+                if old in added:
+                    del added[old]
+                    added[new] = None
+                else:
+                    original = renamed.pop(old, old)
+                    if original != new:
+                        renamed[new] = original
+                connected = _rename_pairs(connected, old, new)
+                disconnected = _rename_pairs(disconnected, old, new)
+        self.added = list(added)
+        self.removed = list(removed)
+        self.connected = list(connected)
+        self.disconnected = list(disconnected)
+        self.renamed = [(old, new) for new, old in renamed.items()]
+        self.incomplete = incomplete
+
+    def __repr__(self):
+        return ('<jack.GraphChange: {} added, {} removed, {} connected, '
+                '{} disconnected, {} renamed>').format(
+                    len(self.added), len(self.removed), len(self.connected),
+                    len(self.disconnected), len(self.renamed))
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.connected
+                    or self.disconnected or self.renamed or self.incomplete)
+
+
+class _GraphChangeBatcher:
+    """Collect notifications, see Client.set_graph_change_callback()."""
+
+    def __init__(self, client, callback, interval):
+        self._client = client
+        self._callback = callback
+        # Appending and popping are atomic, no lock is needed:
+        self._events = _deque()
+        self._stopped = _threading.Event()
+        self._thread = None
+        client._listeners.append(self._listener)
+        if interval is not None:
+            self._thread = _threading.Thread(
+                target=self._run, args=(interval,), daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._client._listeners.remove(self._listener)
+        self._stopped.set()
+        if self._thread not in (None, _threading.current_thread()):
+            self._thread.join()
+
+    def flush(self):
+        popleft = self._events.popleft
+
+        def events():
+            while True:
+                try:
+                    yield popleft()
+                except IndexError:
+                    return
+
+        changes = GraphChange(events())
+        if changes:
+            self._callback(changes)
+
+    def _run(self, interval):
+        while not self._stopped.wait(interval):
+            self.flush()
+
+    def _listener(self, event, *args):
+        """Listener for notifications from Client.
+
+        Port names have to be resolved immediately, because the ports
+        may be gone when the batch is delivered.
+
+        """
+        if event == 'port_registration':
+            port_ptr, register = args
+            self._events.append((event, _port_name(port_ptr), register))
+        elif event == 'port_connect':
+            a, b, connect = args
+            self._events.append((event, *_connection_names(a, b), connect))
+        elif event == 'port_rename':
+            _, old, new = args
+            self._events.append((event, old, new))
+        elif event == 'graph_order' and self._thread is None:
+            self.flush()
+
+
+class AsyncClient:
+    """Use a `Client` from ``asyncio`` code.
+
+    JACK notifications are forwarded to the event loop (see `events()`)
+    and blocking operations are available as coroutines, which run in
+    an executor.
+
+    Parameters
+    ----------
+    client : Client
+        The client to be used.  It is *not* closed by `close()`.
+        Notifications are available even if the client was activated
+        before creating the `AsyncClient`.
+    loop : asyncio.AbstractEventLoop, optional
+        The event loop to deliver notifications to.  By default, the
+        running event loop is used, i.e. the `AsyncClient` must be
+        created from a coroutine.
+    executor : concurrent.futures.Executor, optional
+        The executor for blocking operations.  By default, the default
+        executor of the event loop is used.
+
+    Attributes
+    ----------
+    client
+        The underlying `Client`.
+
+    Examples
+    --------
+    ::
+
+        async def main():
+            with jack.Client('MyClient') as client:
+                async with jack.AsyncClient(client) as aclient:
+                    async for event, args in aclient.events():
+                        if event == 'shutdown':
+                            break
+                        print(event, *args)
+
+        asyncio.run(main())
+
+    """
+
+    def __init__(self, client, loop=None, executor=None):
+        import asyncio
+        if loop is None:
+            loop = asyncio.get_running_loop()
+        self.client = client
+        self._loop = loop
+        self._executor = executor
+        self._streams = []
+        client._listeners.append(self._listener)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    def events(self, maxsize=1024, events=None):
+        """Get an asynchronous iterator over JACK notifications.
+
+        Each item is a tuple ``(event, args)``, where *event* is one of
+        the strings below and *args* is a tuple of arguments:
+
+        ``'port_registration'``
+            ``(name, register)`` with the full port name and ``True``
+            for registration, ``False`` for unregistration.
+        ``'port_connect'``
+            ``(source, destination, connect)`` with full port names.
+        ``'port_rename'``
+            ``(old, new)`` with full port names.
+        ``'client_registration'``
+            ``(name, register)``, see
+            `Client.set_client_registration_callback()`.
+        ``'graph_order'``
+            ``()``, see `Client.set_graph_order_callback()`.
+        ``'xrun'``
+            ``(delayed_usecs,)``, see `Client.set_xrun_callback()`.
+        ``'shutdown'``
+            ``(status, reason)``, see `Client.set_shutdown_callback()`.
+        ``'property_change'``
+            ``(subject, key, change)``, see
+            `Client.set_property_change_callback()`.
+
+        Port names are ``None`` if the port was not available anymore.
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            Maximum number of buffered notifications.  If the consumer
+            cannot keep up, further notifications are dropped and
+            counted in `EventStream.dropped`.
+        events : iterable of str, optional
+            Only forward the given kinds of notifications.
+
+        Returns
+        -------
+        EventStream
+
+        """
+        stream = EventStream(self, maxsize, events)
+        self._streams.append(stream)
+        return stream
+
+    def close(self):
+        """Stop forwarding notifications and end all `events()` iterators.
+
+        An `AsyncClient` can also be used as an *asynchronous context
+        manager* in an *async with statement*, which calls `close()`
+        on exit.
+
+        """
+        if self._listener in self.client._listeners:
+            self.client._listeners.remove(self._listener)
+        for stream in tuple(self._streams):
+            stream.close()
+
+    async def run(self, func, *args, **kwargs):
+        """Call a blocking function in the executor, return the result."""
+        if kwargs:
+            func = _functools.partial(func, **kwargs)
+        return await self._loop.run_in_executor(self._executor, func, *args)
+
+    async def connect(self, source, destination):
+        """See `Client.connect()`."""
+        return await self.run(self.client.connect, source, destination)
+
+    async def disconnect(self, source, destination):
+        """See `Client.disconnect()`."""
+        return await self.run(self.client.disconnect, source, destination)
+
+    async def apply_connections(self, *args, **kwargs):
+        """See `Client.apply_connections()`."""
+        return await self.run(self.client.apply_connections, *args, **kwargs)
+
+    async def get_ports(self, *args, **kwargs):
+        """See `Client.get_ports()`."""
+        return await self.run(self.client.get_ports, *args, **kwargs)
+
+    async def get_port_by_name(self, name):
+        """See `Client.get_port_by_name()`."""
+        return await self.run(self.client.get_port_by_name, name)
+
+    async def get_all_connections(self, port):
+        """See `Client.get_all_connections()`."""
+        return await self.run(self.client.get_all_connections, port)
+
+    async def graph_snapshot(self):
+        """See `Client.graph_snapshot()`."""
+        return await self.run(self.client.graph_snapshot)
+
+    def _listener(self, event, *args):
+        """Listener for notifications from Client (non-RT thread)."""
+        if not self._streams:
+            return
+        if event == 'port_registration':
+            port_ptr, register = args
+            args = _port_name(port_ptr), register
+        elif event == 'port_connect':
+            a, b, connect = args
+            args = (*_connection_names(a, b), connect)
+        elif event == 'port_rename':
+            args = args[1:]
+        for stream in tuple(self._streams):
+            stream._put(event, args)
+
+
+class EventStream:
+    """Asynchronous iterator over JACK notifications.
+
+    This class cannot be instantiated directly, see
+    `AsyncClient.events()`.
+
+    Attributes
+    ----------
+    dropped
+        Number of notifications that were dropped because the buffer
+        was full.
+
+    """
+
+    def __init__(self, aclient, maxsize, events):
+        self._aclient = aclient
+        self._maxsize = maxsize
+        self._events = None if events is None else frozenset(events)
+        self._buffer = _deque()
+        self._wakeup_pending = False
+        self._waiter = None
+        self._closed = False
+        self.dropped = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._buffer:
+            if self._closed:
+                raise StopAsyncIteration
+            self._waiter = self._aclient._loop.create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return self._buffer.popleft()
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def close(self):
+        """Stop receiving notifications.
+
+        Notifications that are already buffered are still delivered.
+
+        """
+        if not self._closed:
+            self._closed = True
+            self._aclient._streams.remove(self)
+            self._schedule_wakeup()
+
+    def _put(self, event, args):
+        """Called from JACK's notification thread."""
+        if self._events is not None and event not in self._events:
+            return
+        if len(self._buffer) >= self._maxsize:
+            self.dropped += 1
+            return
+        self._buffer.append((event, args))
+        self._schedule_wakeup()
+
+    def _schedule_wakeup(self):
+        # Only one pending call per burst of notifications:
+        if not self._wakeup_pending:
+            self._wakeup_pending = True
+            try:
+                self._aclient._loop.call_soon_threadsafe(self._wakeup)
+            except RuntimeError:
+                pass  # Event loop is closed
+
+    def _wakeup(self):
+        self._wakeup_pending = False
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+
+class PortIndex:
+    """A client-side index of port names, short names and aliases.
+
+    This class cannot be instantiated directly, see
+    `Client.port_index()`.
+
+    All lookups return `Port` (or `MidiPort`, `OwnPort`,
+    `OwnMidiPort`) objects, sorted by their full names.
+
+    .. note:: There are no notifications for changed aliases, use
+       `refresh()` to get those.
+
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._lock = _threading.RLock()
+        self._ptrs = {}  # full name -> port pointer
+        self._names = {}  # port pointer -> full name
+        self._aliases = {}  # full name -> tuple of aliases
+        self._keys = []  # sorted list of (key, full name)
+        self._closed = False
+        client._listeners.append(self._update)
+        self.refresh()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self._ptrs)
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __repr__(self):
+        return f'<jack.PortIndex: {len(self)} ports>'
+
+    def refresh(self):
+        """Query all port names and aliases from the JACK server again."""
+        client = self._client
+        with self._lock:
+            self._ptrs.clear()
+            self._names.clear()
+            self._aliases.clear()
+            del self._keys[:]
+            names = _ffi.gc(_lib.jack_get_ports(client._ptr, b'', b'', 0),
+                            _lib.jack_free)
+            for name in _decode_names(names):
+                port_ptr = _lib.jack_port_by_name(client._ptr, name.encode())
+                if port_ptr:
+                    self._keys.extend(self._add(name, port_ptr, insort=False))
+            self._keys.sort()
+
+    def close(self):
+        """Stop updating the index.
+
+        An index can also be used as a *context manager* in a *with
+        statement*, which calls `close()` on exit.
+
+        """
+        if not self._closed:
+            self._closed = True
+            self._client._listeners.remove(self._update)
+
+    def get(self, name):
+        """Get port by full name or alias, or ``None`` if not found."""
+        with self._lock:
+            port_ptr = self._ptrs.get(name)
+            if port_ptr is None:
+                # _keys also contains (ambiguous) short names, skip them:
+                idx = _bisect.bisect_left(self._keys, (name,))
+                while idx < len(self._keys) and self._keys[idx][0] == name:
+                    full_name = self._keys[idx][1]
+                    if name in self._aliases[full_name]:
+                        port_ptr = self._ptrs[full_name]
+                        break
+                    idx += 1
+            if port_ptr is None:
+                return None
+            return self._client._wrap_port_ptr(port_ptr)
+
+    def prefix(self, prefix):
+        """Get ports whose name, short name or alias start with *prefix*."""
+        with self._lock:
+            return self._ports(self._names_in_range(prefix))
+
+    def glob(self, pattern):
+        """Get ports whose full name, short name or alias match *pattern*.
+
+        The *pattern* uses shell-style wildcards, see ``fnmatch``.
+
+        """
+        literal = _re.match(r'[^*?[]*', pattern).group()
+        match = _re.compile(_fnmatch.translate(pattern)).match
+        with self._lock:
+            return self._ports(self._names_in_range(literal, match))
+
+    def regex(self, pattern):
+        """Get ports whose full name or alias contains a match for *pattern*.
+
+        This uses the same kind of matching as `Client.get_ports()`
+        (but Python's regular expression syntax, see ``re``).
+
+        """
+        search = _re.compile(pattern).search
+        with self._lock:
+            names = {}
+            for name, aliases in self._aliases.items():
+                if search(name) or any(search(alias) for alias in aliases):
+                    names[name] = None
+            return self._ports(names)
+
+    def _names_in_range(self, prefix, match=None):
+        keys = self._keys
+        names = {}
+        idx = _bisect.bisect_left(keys, (prefix,))
+        while idx < len(keys) and keys[idx][0].startswith(prefix):
+            key, name = keys[idx]
+            if match is None or match(key):
+                names[name] = None
+            idx += 1
+        return names
+
+    def _ports(self, names):
+        wrap = self._client._wrap_port_ptr
+        return [wrap(self._ptrs[name]) for name in sorted(names)]
+
+    def _add(self, name, port_ptr, insort=True):
+        aliases = tuple(_get_aliases(port_ptr))
+        self._ptrs[name] = port_ptr
+        self._names[port_ptr] = name
+        self._aliases[name] = aliases
+        shortname = name[name.index(':') + 1:]
+        items = [(key, name) for key in {name, shortname, *aliases}]
+        if insort:
+            for item in items:
+                _bisect.insort(self._keys, item)
+        return items
+
+    def _remove(self, name):
+        port_ptr = self._ptrs.pop(name)
+        del self._names[port_ptr]
+        shortname = name[name.index(':') + 1:]
+        for key in {name, shortname, *self._aliases.pop(name)}:
+            idx = _bisect.bisect_left(self._keys, (key, name))
+            del self._keys[idx]
+
+    def _update(self, event, *args):
+        """Listener for notifications from Client."""
+        with self._lock:
+            if event == 'port_registration':
+                port_ptr, register = args
+                if port_ptr in self._names:
+                    self._remove(self._names[port_ptr])
+                if port_ptr and register:
+                    self._add(_decode(_lib.jack_port_name(port_ptr)),
+                              port_ptr)
+            elif event == 'port_rename':
+                _, old, new = args
+                if old in self._ptrs:
+                    port_ptr = self._ptrs[old]
+                    self._remove(old)
+                    self._add(new, port_ptr)
+
+
+class MetadataCache:
+    """A client-side cache of metadata properties.
+
+    This class cannot be instantiated directly, see
+    `Client.metadata_cache()`.
+
+    Values (and the information that a property does *not* exist) are
+    cached per subject and key.  Repeated queries only cost a dictionary
+    lookup until the property is changed.
+
+    """
+
+    def __init__(self, client, preload):
+        self._client = client
+        self._lock = _threading.Lock()
+        self._subjects = {}  # subject -> dict of all properties
+        self._partial = {}  # subject -> dict of some properties (or None)
+        self._complete = False  # all subjects are in self._subjects
+        self._dirty = set()  # subjects changed since self._complete
+        self._generation = 0  # incremented on each change notification
+        self._closed = False
+        client._listeners.append(self._update)
+        if preload:
+            self.load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return '<jack.MetadataCache: {} subjects>'.format(
+            len(self._subjects.keys() | self._partial.keys()))
+
+    def get(self, subject, key):
+        """Get a metadata property on *subject*.
+
+        See `get_property()`.
+
+        """
+        subject = _uuid_parse(subject)
+        with self._lock:
+            properties = self._subjects.get(subject)
+            if properties is not None:
+                return properties.get(key)
+            properties = self._partial.get(subject, {})
+            if key in properties:
+                return properties[key]
+            if self._complete and subject not in self._dirty:
+                return None
+            generation = self._generation
+        value = get_property(subject, key)
+        with self._lock:
+            if generation == self._generation:
+                self._partial.setdefault(subject, {})[key] = value
+        return value
+
+    def get_properties(self, subject):
+        """Get all metadata properties of *subject*.
+
+        See `get_properties()`.
+
+        """
+        subject = _uuid_parse(subject)
+        with self._lock:
+            properties = self._subjects.get(subject)
+            if properties is not None:
+                return dict(properties)
+            if self._complete and subject not in self._dirty:
+                return {}
+            generation = self._generation
+        properties = get_properties(subject)
+        with self._lock:
+            if generation == self._generation:
+                self._subjects[subject] = properties
+                self._partial.pop(subject, None)
+                self._dirty.discard(subject)
+        return dict(properties)
+
+    def load(self):
+        """Load all properties of all subjects at once.
+
+        This uses `get_all_properties()`, afterwards all queries are
+        answered from the cache (until properties are changed).
+
+        """
+        for _ in range(3):
+            with self._lock:
+                generation = self._generation
+            all_properties = get_all_properties()
+            with self._lock:
+                if generation == self._generation:
+                    self._subjects = all_properties
+                    self._partial.clear()
+                    self._dirty.clear()
+                    self._complete = True
+                    return
+        # Properties keep changing, they will be queried one by one
+
+    def clear(self):
+        """Remove all cached properties."""
+        with self._lock:
+            self._generation += 1
+            self._subjects.clear()
+            self._partial.clear()
+            self._dirty.clear()
+            self._complete = False
+
+    def close(self):
+        """Stop receiving change notifications.
+
+        A cache can also be used as a *context manager* in a *with
+        statement*, which calls `close()` on exit.
+
+        """
+        if not self._closed:
+            self._closed = True
+            self._client._listeners.remove(self._update)
+            self.clear()
+
+    def _update(self, event, *args):
+        """Listener for notifications from Client."""
+        if event != 'property_change':
+            return
+        subject, key, _ = args
+        if not subject and not key:
+            # All properties have been removed
+            self.clear()
+            return
+        with self._lock:
+            self._generation += 1
+            properties = self._subjects.pop(subject, None)
+            if key:
+                if properties is not None:
+                    properties.pop(key, None)
+                    self._partial[subject] = properties
+                elif subject in self._partial:
+                    self._partial[subject].pop(key, None)
+            else:
+                self._partial.pop(subject, None)
+            if self._complete:
+                self._dirty.add(subject)
+
+
+class PropertyMap(_Mapping):
+    """Metadata properties of all subjects, decoded on demand.
+
+    This class cannot be instantiated directly, see
+    ``get_all_properties(lazy=True)``.
+
+    This is a read-only mapping from UUIDs to dictionaries as returned
+    by `get_properties()`.  The properties of a subject are decoded
+    when they are first accessed.  The memory allocated by JACK is
+    kept until the object is garbage-collected or `close()` is called.
+
+    """
+
+    def __init__(self, descs, number):
+
+        def free(descs):
+            free_description_itself = 0
+            for idx in range(number):
+                _lib.jack_free_description(descs + idx,
+                                           free_description_itself)
+            _lib.jack_free(descs)
+
+        self._descs = _ffi.gc(descs, free) if descs else None
+        self._index = {descs[idx].subject: idx for idx in range(number)}
+        self._decoded = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return f'<jack.PropertyMap: {len(self)} subjects>'
+
+    def __getitem__(self, subject):
+        try:
+            subject = _uuid_parse(subject)
+        except (TypeError, ValueError):
+            raise KeyError(subject)
+        prop_dict = self._decoded.get(subject)
+        if prop_dict is None:
+            idx = self._index[subject]
+            prop_dict = self._decoded[subject] = _decode_properties(
+                self._description(idx))
+        return prop_dict
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def with_prefix(self, prefix):
+        """Get only properties whose key starts with *prefix*.
+
+        Keys are compared before decoding, only matching properties are
+        decoded.
+
+        Returns
+        -------
+        dict
+            A dictionary mapping UUIDs to nested dictionaries, only
+            containing subjects with at least one matching key.
+
+        """
+        prefix = prefix.encode()
+        result = {}
+        for subject, idx in self._index.items():
+            prop_dict = _decode_properties(self._description(idx), prefix)
+            if prop_dict:
+                result[subject] = prop_dict
+        return result
+
+    def close(self):
+        """Free the memory allocated by JACK.
+
+        Properties that were not yet accessed are not available
+        afterwards.  A `PropertyMap` can also be used as a *context
+        manager* in a *with statement*, which calls `close()` on exit.
+
+        """
+        if self._descs is not None:
+            _ffi.release(self._descs)
+            self._descs = None
+            self._index = {subject: idx for subject, idx in self._index.items()
+                           if subject in self._decoded}
+
+    def _description(self, idx):
+        if self._descs is None:
+            raise ValueError('PropertyMap is closed')
+        return self._descs + idx
+
+
+class RingBuffer:
+    """JACK's lock-free ringbuffer."""
+
+    def __init__(self, size):
+        """Create a lock-free ringbuffer.
+
+        A ringbuffer is a good way to pass data between threads
+        (e.g. between the main program and the process callback),
+        when streaming realtime data to slower media, like audio file
+        playback or recording.
+
+        The key attribute of a ringbuffer is that it can be safely
+        accessed by two threads simultaneously -- one reading from the
+        buffer and the other writing to it -- without using any
+        synchronization or mutual exclusion primitives.  For this to
+        work correctly, there can only be a single reader and a single
+        writer thread.  Their identities cannot be interchanged.
+
+        Parameters
+        ----------
+        size : int
+            Size in bytes.  JACK will allocate a buffer of at least this
+            size (rounded up to the next power of 2), but one byte is
+            reserved for internal use.  Use `write_space` to
+            determine the actual size available for writing.
+
+
+        Raises
+        ------
+        JackError
+            If the rightbufefr could not be allocated.
+
+        """
+        ptr = _lib.jack_ringbuffer_create(size)
+        if not ptr:
+            raise JackError('Could not create RingBuffer')
+        self._ptr = _ffi.gc(ptr, _lib.jack_ringbuffer_free)
+
+    @property
+    def write_space(self):
+        """The number of bytes available for writing."""
+        return _lib.jack_ringbuffer_write_space(self._ptr)
+
+    def write(self, data):
+        """Write data into the ringbuffer.
+
+        Parameters
+        ----------
+        data : buffer or bytes or iterable of int
+            Bytes to be written to the ringbuffer.
+
+        Returns
+        -------
+        int
+            The number of bytes written, which could be less than the
+            length of *data* if there was no more space left
+            (see `write_space`).
+
+        See Also
+        --------
+        :attr:`write_space`, :attr:`write_buffers`
+
+        """
+        try:
+            data = _ffi.from_buffer(data)
+        except AttributeError:
+            pass  # from_buffer() not supported
+        except TypeError:
+            pass  # input is not a buffer
+        return _lib.jack_ringbuffer_write(self._ptr, data, len(data))
+
+    @property
+    def write_buffers(self):
+        """Contains two buffer objects that can be written to directly.
+
+        Two are needed because the space available for writing may be
+        split across the end of the ringbuffer.  Either of them could be
+        0 length.
+
+        This can be used as a no-copy version of `write()`.
+
+        When finished with writing, `write_advance()` should be used.
+
+        .. note:: After an operation that changes the write pointer
+           (`write()`, `write_advance()`, `reset()`), the buffers are no
+           longer valid and one should use this property again to get
+           new ones.
+
+        """
+        vectors = _ffi.new('jack_ringbuffer_data_t[2]')
+        _lib.jack_ringbuffer_get_write_vector(self._ptr, vectors)
+        return (
+            _ffi.buffer(vectors[0].buf, vectors[0].len),
+            _ffi.buffer(vectors[1].buf, vectors[1].len)
+        )
+
+    def write_advance(self, size):
+        """Advance the write pointer.
+
+        After data has been written to the ringbuffer using
+        `write_buffers`, use this method to advance the buffer pointer,
+        making the data available for future read operations.
+
+        Parameters
+        ----------
+        size : int
+            The number of bytes to advance.
+
+        """
+        _lib.jack_ringbuffer_write_advance(self._ptr, size)
+
+    @property
+    def read_space(self):
+        """The number of bytes available for reading."""
+        return _lib.jack_ringbuffer_read_space(self._ptr)
+
+    def read(self, size):
+        """Read data from the ringbuffer.
+
+        Parameters
+        ----------
+        size : int
+            Number of bytes to read.
+
+        Returns
+        -------
+        buffer
+            A buffer object containing the requested data.
+            If no more data is left (see `read_space`), a smaller
+            (or even empty) buffer is returned.
+
+        See Also
+        --------
+        peek, :attr:`read_space`, :attr:`read_buffers`
+
+        """
+        data = _ffi.new('unsigned char[]', size)
+        size = _lib.jack_ringbuffer_read(self._ptr, data, size)
+        return _ffi.buffer(data, size)
+
+    def peek(self, size):
+        """Peek at data from the ringbuffer.
+
+        Opposed to `read()` this function does not move the read
+        pointer.  Thus it's a convenient way to inspect data in the
+        ringbuffer in a continuous fashion.
+        The price is that the data is copied into a newly allocated
+        buffer.  For "raw" non-copy inspection of the data in the
+        ringbuffer use `read_buffers`.
+
+        Parameters
+        ----------
+        size : int
+            Number of bytes to peek.
+
+        Returns
+        -------
+        buffer
+            A buffer object containing the requested data.
+            If no more data is left (see `read_space`), a smaller
+            (or even empty) buffer is returned.
+
+        See Also
+        --------
+        read, :attr:`read_space`, :attr:`read_buffers`
+
+        """
+        data = _ffi.new('unsigned char[]', size)
         size = _lib.jack_ringbuffer_peek(self._ptr, data, size)
         return _ffi.buffer(data, size)
 
     @property
-    def read_buffers(self):
-        """Contains two buffer objects that can be read directly.
+    def read_buffers(self):
+        """Contains two buffer objects that can be read directly.
+
+        Two are needed because the data to be read may be split across
+        the end of the ringbuffer.  Either of them could be 0 length.
+
+        This can be used as a no-copy version of `peek()` or `read()`.
+
+        When finished with reading, `read_advance()` should be used.
+
+        .. note:: After an operation that changes the read pointer
+           (`read()`, `read_advance()`, `reset()`), the buffers are no
+           longer valid and one should use this property again to get
+           new ones.
+
+        """
+        vectors = _ffi.new('jack_ringbuffer_data_t[2]')
+        _lib.jack_ringbuffer_get_read_vector(self._ptr, vectors)
+        return (
+            _ffi.buffer(vectors[0].buf, vectors[0].len),
+            _ffi.buffer(vectors[1].buf, vectors[1].len)
+        )
+
+    def read_advance(self, size):
+        """Advance the read pointer.
+
+        After data has been read from the ringbuffer using
+        `read_buffers` or `peek()`, use this method to advance the
+        buffer pointers, making that space available for future write
+        operations.
+
+        Parameters
+        ----------
+        size : int
+            The number of bytes to advance.
+
+        """
+        _lib.jack_ringbuffer_read_advance(self._ptr, size)
+
+    def mlock(self):
+        """Lock a ringbuffer data block into memory.
+
+        Uses the ``mlock()`` system call.  This prevents the
+        ringbuffer's memory from being paged to the swap area.
+
+        .. note:: This is not a realtime operation.
+
+        """
+        _check(_lib.jack_ringbuffer_mlock(self._ptr),
+               'Error mlocking the RingBuffer data')
+
+    def reset(self, size=None):
+        """Reset the read and write pointers, making an empty buffer.
+
+        .. note:: This is not thread safe.
+
+        Parameters
+        ----------
+        size : int, optional
+            The new size for the ringbuffer.
+            Must be less than allocated size.
+
+        """
+        if size is None:
+            _lib.jack_ringbuffer_reset(self._ptr)
+        else:
+            _lib.jack_ringbuffer_reset_size(self._ptr, size)
+
+    @property
+    def size(self):
+        """The number of bytes in total used by the buffer.
+
+        See Also
+        --------
+        :attr:`read_space`, :attr:`write_space`
+
+        """
+        return self._ptr.size
+
+
+class ClipBank:
+    """A collection of memory-mapped audio clips.
+
+    This can be used to trigger sample playback (e.g. from
+    `OwnMidiPort.incoming_midi_events()`) without loading all audio
+    data into memory.  Each clip is memory-mapped from its file and
+    the beginning of each clip is pre-faulted, such that the first few
+    blocks can be played back without waiting for the disk.
+
+    Clips are available as NumPy arrays (see `get_array()`) which
+    directly reference the mapped memory, no data is copied.
+
+    """
+
+    def __init__(self, budget=None, prefault_ms=100):
+        """Create an empty clip bank.
+
+        Parameters
+        ----------
+        budget : int, optional
+            The maximum number of bytes that may be mapped at the same
+            time.  If loading a clip would exceed this, the least
+            recently used clips are evicted (unless they are locked,
+            see `lock()`).  Evicted clips are mapped again on their
+            next use.  By default, there is no limit.
+        prefault_ms : int or float, optional
+            Duration (in milliseconds) at the beginning of each clip
+            that is read into memory right after mapping the file.
+
+        """
+        self.budget = budget
+        self.prefault_ms = prefault_ms
+        self._clips = _OrderedDict()
+
+    def __len__(self):
+        return len(self._clips)
+
+    def __iter__(self):
+        return iter(list(self._clips))
+
+    def __contains__(self, name):
+        return name in self._clips
+
+    def __repr__(self):
+        return f'<jack.ClipBank: {len(self)} clips, {self.mapped_bytes} bytes>'
+
+    @property
+    def mapped_bytes(self):
+        """The number of bytes currently mapped into memory."""
+        return sum(clip.size for clip in list(self._clips.values())
+                   if clip.mmap is not None)
+
+    def load(self, name, path, channels=1, samplerate=None, lock=False):
+        """Add a clip to the bank and map it into memory.
+
+        WAV files (including RF64) must contain 32-bit floating point
+        data.  All other files are treated as headerless ("raw") files
+        containing native 32-bit floating point samples.
+
+        Parameters
+        ----------
+        name : str
+            Name of the clip, used in `get_array()` and friends.
+        path : str
+            File name of a WAV or raw audio file.
+        channels : int, optional
+            Number of channels of a raw file.  This is ignored for WAV
+            files.
+        samplerate : int, optional
+            Sample rate of a raw file, used for pre-faulting.  This is
+            ignored for WAV files.  If not specified, 48000 is assumed.
+        lock : bool, optional
+            If ``True``, the clip is locked (see `lock()`).
+
+        Raises
+        ------
+        ValueError
+            If the file doesn't contain 32-bit floating point data.
+        MemoryError
+            If the clip doesn't fit into *budget*.
+
+        """
+        if name in self._clips:
+            self.unload(name)
+        clip = _Clip(path, channels, samplerate)
+        clip.locked = lock
+        self._map(clip)
+        self._clips[name] = clip
+
+    def unload(self, name):
+        """Remove a clip from the bank and unmap its memory.
+
+        Raises
+        ------
+        BufferError
+            If there are still views (e.g. NumPy arrays) of the clip
+            data in use.
+
+        """
+        clip = self._clips.pop(name)
+        if not clip.unmap():
+            self._clips[name] = clip
+            raise BufferError(f'Clip {name!r} is still in use')
+
+    def lock(self, name):
+        """Lock a clip into memory.
+
+        Locked clips are never evicted and they are pre-faulted
+        completely (not only their first *prefault_ms* milliseconds).
+
+        """
+        clip = self._clips[name]
+        clip.locked = True
+        if clip.mmap is None:
+            self._map(clip)
+        else:
+            clip.prefault(clip.size)
+
+    def unlock(self, name):
+        """Allow a clip to be evicted again.  See `lock()`."""
+        self._clips[name].locked = False
+
+    def get_buffer(self, name):
+        """Get the (interleaved) clip data as read-only memoryview.
+
+        If the clip has been evicted, it is mapped again, which is not
+        a realtime-safe operation.  Use `lock()` to avoid that.
+
+        """
+        clip = self._clips[name]
+        if clip.mmap is None:
+            self._map(clip)
+        self._clips.move_to_end(name)
+        return clip.buffer
+
+    def get_array(self, name):
+        """Get the clip data as NumPy array.
+
+        The returned array has the shape ``(frames, channels)`` and the
+        data type ``float32``.  It is a read-only view of the mapped
+        memory, the data is not copied.
+
+        Make sure to ``import numpy`` before calling this, otherwise the
+        first call might take a long time.
+
+        This can be called from within the process callback (see
+        `Client.set_process_callback()`), as long as the clip has not
+        been evicted (see `get_buffer()`).
+
+        """
+        clip = self._clips[name]
+        if clip.array is None:
+            import numpy as np
+            clip.array = np.frombuffer(
+                self.get_buffer(name), dtype='<f4').reshape(-1, clip.channels)
+        else:
+            self._clips.move_to_end(name)
+        return clip.array
+
+    def _map(self, clip):
+        """Map a clip, evicting other clips if needed."""
+        if self.budget is not None:
+            needed = self.mapped_bytes + clip.size - self.budget
+            for other in list(self._clips.values()):
+                if needed <= 0:
+                    break
+                if other.mmap is None or other.locked:
+                    continue
+                if other.unmap():
+                    needed -= other.size
+            if needed > 0:
+                raise MemoryError(
+                    f'{clip.path!r}: not enough memory budget left')
+        clip.map()
+        if clip.locked:
+            clip.prefault(clip.size)
+        else:
+            clip.prefault(int(self.prefault_ms * clip.samplerate / 1000)
+                          * clip.channels * 4)
+
+
+class _Clip:
+    """Helper class for ClipBank."""
+
+    __slots__ = ('path', 'channels', 'samplerate', 'offset', 'size',
+                 'locked', 'mmap', 'buffer', 'array')
+
+    def __init__(self, path, channels, samplerate):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(4096)
+            f.seek(0, _os.SEEK_END)
+            filesize = f.tell()
+        wav = _parse_wav_header(header, filesize)
+        if wav is None:
+            self.channels = channels
+            self.samplerate = samplerate or 48000
+            self.offset = 0
+            self.size = filesize
+        else:
+            (tag, self.channels, self.samplerate, bits,
+             self.offset, self.size) = wav
+            if tag != _WAVE_FORMAT_IEEE_FLOAT or bits != 32:
+                raise ValueError(
+                    f'{path!r}: only 32-bit float WAV files are supported')
+        self.size -= self.size % (4 * self.channels)
+        self.locked = False
+        self.mmap = self.buffer = self.array = None
+
+    def map(self):
+        with open(self.path, 'rb') as f:
+            self.mmap = _mmap.mmap(f.fileno(), self.offset + self.size,
+                                   access=_mmap.ACCESS_READ)
+        self._make_buffer()
+
+    def unmap(self):
+        """Return False if the memory is still in use."""
+        if self.mmap is not None:
+            self.array = self.buffer = None
+            try:
+                self.mmap.close()
+            except BufferError:
+                self._make_buffer()
+                return False
+            self.mmap = None
+        return True
+
+    def _make_buffer(self):
+        self.buffer = memoryview(self.mmap)[
+            self.offset:self.offset + self.size].cast('f')
+
+    def prefault(self, size):
+        """Touch each memory page within the first size bytes."""
+        end = self.offset + min(size, self.size)
+        if hasattr(self.mmap, 'madvise'):
+            self.mmap.madvise(_mmap.MADV_WILLNEED, 0, end)
+        mm = self.mmap
+        for pos in range(0, end, _mmap.PAGESIZE):
+            mm[pos]  # Read one byte per page
+
+
+class Recorder:
+    """Record audio input ports to WAV files.
+
+    Each port is recorded into a separate mono 32-bit float WAV file
+    (which is automatically turned into an RF64 file if it gets larger
+    than 4 GiB).  The audio data is passed from the process callback
+    to a background thread via one `RingBuffer` per port, the
+    background thread writes large, aligned chunks to the files.
+
+    The process callback (see `Client.set_process_callback()`) has to
+    call `process()` in each cycle, e.g.::
+
+        recorder = jack.Recorder(client.inports, 'take1-{}.wav')
+
+        @client.set_process_callback
+        def process(frames):
+            recorder.process(frames)
+
+        with client, recorder:
+            input('Press Return to stop recording ...')
+
+    The WAV headers are updated regularly while recording.  If a
+    recording is interrupted (e.g. by a power failure), use
+    `Recorder.recover()` to repair the files.
+
+    """
+
+    def __init__(self, ports, filenames, buffersize=10, chunksize=2**18,
+                 preallocate=2**26):
+        """Create a recorder (which is not yet recording).
+
+        Parameters
+        ----------
+        ports : sequence of OwnPort
+            The audio ports to be recorded, typically `Client.inports`.
+        filenames : str or sequence of str
+            Either a list of file names (one for each port), or a string
+            that contains ``{}``, which is replaced by the short name of
+            each port (see `Port.shortname`).
+        buffersize : float, optional
+            Duration (in seconds) that can be buffered before data is
+            lost.
+        chunksize : int, optional
+            Number of bytes written to disk at once.  This must be a
+            power of two.
+        preallocate : int, optional
+            Number of bytes by which the files are enlarged each time
+            they get full.  This is only done where
+            ``os.posix_fallocate()`` is available.
+
+        Attributes
+        ----------
+        overruns
+            Number of blocks which couldn't be recorded because the
+            ringbuffers were full.
+        error
+            Exception raised in the background thread (if any).
+
+        """
+        self._ports = list(ports)
+        if isinstance(filenames, str):
+            filenames = [filenames.format(port.shortname)
+                         for port in self._ports]
+        self._filenames = list(filenames)
+        if len(self._filenames) != len(self._ports):
+            raise ValueError('Number of ports and file names must be equal')
+        if chunksize & (chunksize - 1):
+            raise ValueError('chunksize must be a power of two')
+        client = self._ports[0]._client
+        self._samplerate = client.samplerate
+        size = max(int(buffersize * self._samplerate) * 4, 2 * chunksize)
+        self._ringbuffers = [RingBuffer(size) for _ in self._ports]
+        self._chunksize = chunksize
+        self._preallocate = preallocate
+        self._thread = None
+        self._stop = _threading.Event()
+        self._recording = False
+        self.overruns = 0
+        self.error = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def recording(self):
+        """Whether the recorder is currently recording."""
+        return self._recording
+
+    def start(self):
+        """Create the files and start recording."""
+        if self._thread is not None:
+            raise RuntimeError('Recorder is already running')
+        self.overruns = 0
+        self.error = None
+        for rb in self._ringbuffers:
+            rb.reset()
+        self._files = [_RecorderFile(name, self._samplerate)
+                       for name in self._filenames]
+        self._stop.clear()
+        self._thread = _threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._recording = True
+
+    def stop(self):
+        """Stop recording, write remaining data and close the files.
+
+        Raises
+        ------
+        OSError
+            If an error occurred while writing the files.
+
+        """
+        if self._thread is None:
+            return
+        self._recording = False
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        for f, rb in zip(self._files, self._ringbuffers):
+            try:
+                if self.error is None:
+                    self._write(f, rb, 1)
+                f.close()
+            except OSError as e:
+                self.error = self.error or e
+        if self.error is not None:
+            raise self.error
+
+    def process(self, frames):
+        """Copy the current block of all ports into the ringbuffers.
+
+        This must be called in each cycle of the process callback
+        (see `Client.set_process_callback()`).  If there is not enough
+        space in the ringbuffers, the whole block is discarded (for all
+        ports, to keep them in sync) and `overruns` is incremented.
+
+        """
+        if not self._recording:
+            return
+        size = frames * 4
+        for rb in self._ringbuffers:
+            if rb.write_space < size:
+                self.overruns += 1
+                return
+        for port, rb in zip(self._ports, self._ringbuffers):
+            rb.write(port.get_buffer())
+
+    @staticmethod
+    def recover(filename):
+        """Repair an unfinished recording.
+
+        Updates the WAV header of a file that has not been closed
+        properly and removes the pre-allocated space at its end.
+        Trailing silence recorded after the last header update (which
+        happens about once per second) is also removed, because it
+        cannot be distinguished from the pre-allocated space.
+
+        Returns
+        -------
+        int
+            The number of frames in the repaired file.
+
+        """
+        with open(filename, 'r+b', buffering=0) as f:
+            header = f.read(_WAV_HEADER_SIZE)
+            filesize = f.seek(0, _os.SEEK_END)
+            wav = _parse_wav_header(header, filesize)
+            if wav is None:
+                raise ValueError(f'{filename!r}: not a WAV file')
+            _, channels, samplerate, _, offset, _ = wav
+            if offset != _WAV_HEADER_SIZE:
+                raise ValueError(f'{filename!r}: not created by Recorder')
+            # _parse_wav_header() replaces a size of zero by the file size,
+            # an "infinite" file size reveals what is actually stored:
+            header_size = _parse_wav_header(header, _sys.maxsize)[5]
+            if header_size > filesize - offset:
+                header_size = 0
+            # The size in the header might be outdated, therefore the end
+            # of the data is searched by skipping trailing zeros (but only
+            # after the data that is known to be valid):
+            end = filesize
+            while end > offset + header_size:
+                start = max(end - 2**20, offset + header_size)
+                f.seek(start)
+                data = f.read(end - start).rstrip(b'\0')
+                if data:
+                    end = start + len(data)
+                    break
+                end = start
+            data_size = end - offset
+            data_size += -data_size % (4 * channels)
+            f.seek(0)
+            f.write(_make_wav_header(channels, samplerate, data_size))
+            f.truncate(offset + data_size)
+        return data_size // (4 * channels)
+
+    def _run(self):
+        """Background thread for writing to the files."""
+        try:
+            interval = self._chunksize / 4 / self._samplerate / 2
+            while not self._stop.wait(interval):
+                for f, rb in zip(self._files, self._ringbuffers):
+                    self._write(f, rb, self._chunksize)
+                    f.update_header()
+        except OSError as e:
+            self.error = e
+            self._recording = False
+
+    def _write(self, f, rb, blocksize):
+        """Write all available multiples of blocksize."""
+        while True:
+            buf = rb.read_buffers[0]
+            size = len(buf) - len(buf) % blocksize
+            if not size:
+                break
+            f.write(memoryview(buf)[:size], self._preallocate)
+            rb.read_advance(size)
+
+
+class _RecorderFile:
+    """Helper class for Recorder."""
+
+    def __init__(self, filename, samplerate):
+        self._file = open(filename, 'w+b', buffering=0)
+        self._samplerate = samplerate
+        self._file.write(_make_wav_header(1, samplerate, 0))
+        self._allocated = _WAV_HEADER_SIZE
+        self._data_size = 0
+        self._header_size = 0
+        self._header_time = _time.monotonic()
+
+    def write(self, data, preallocate):
+        end = _WAV_HEADER_SIZE + self._data_size + len(data)
+        if end > self._allocated and hasattr(_os, 'posix_fallocate'):
+            size = max(preallocate, end - self._allocated)
+            _os.posix_fallocate(self._file.fileno(), self._allocated, size)
+            self._allocated += size
+        while data:
+            written = self._file.write(data)
+            data = data[written:]
+            self._data_size += written
+
+    def update_header(self, interval=1):
+        """Write the current size into the header once per interval."""
+        now = _time.monotonic()
+        if (self._data_size != self._header_size
+                and now - self._header_time >= interval):
+            self._patch_header()
+            self._header_time = now
+
+    def close(self):
+        try:
+            self._patch_header()
+            self._file.truncate(_WAV_HEADER_SIZE + self._data_size)
+        finally:
+            self._file.close()
+
+    def _patch_header(self):
+        self._file.seek(0)
+        self._file.write(_make_wav_header(1, self._samplerate,
+                                          self._data_size))
+        self._file.seek(_WAV_HEADER_SIZE + self._data_size)
+        self._header_size = self._data_size
+
+
+class Status:
+    """Representation of the JACK status bits."""
+
+    __slots__ = '_code'
+
+    def __init__(self, code):
+        self._code = code
+
+    def __repr__(self):
+        flags = ', '.join(name for name in dir(self)
+                          if not name.startswith('_') and getattr(self, name))
+        if not flags:
+            flags = 'no flags set'
+        return f'<jack.Status 0x{self._code:X}: {flags}>'
+
+    @property
+    def failure(self):
+        """Overall operation failed."""
+        return self._hasflag(_lib.JackFailure)
+
+    @property
+    def invalid_option(self):
+        """The operation contained an invalid or unsupported option."""
+        return self._hasflag(_lib.JackInvalidOption)
+
+    @property
+    def name_not_unique(self):
+        """The desired client name was not unique.
+
+        With the *use_exact_name* option of `Client`, this situation is
+        fatal.  Otherwise, the name is modified by appending a dash and
+        a two-digit number in the range "-01" to "-99".  `Client.name`
+        will return the exact string that was used.  If the specified
+        *name* plus these extra characters would be too long, the open
+        fails instead.
+
+        """
+        return self._hasflag(_lib.JackNameNotUnique)
+
+    @property
+    def server_started(self):
+        """The JACK server was started for this `Client`.
+
+        Otherwise, it was running already.
+
+        """
+        return self._hasflag(_lib.JackServerStarted)
+
+    @property
+    def server_failed(self):
+        """Unable to connect to the JACK server."""
+        return self._hasflag(_lib.JackServerFailed)
+
+    @property
+    def server_error(self):
+        """Communication error with the JACK server."""
+        return self._hasflag(_lib.JackServerError)
+
+    @property
+    def no_such_client(self):
+        """Requested client does not exist."""
+        return self._hasflag(_lib.JackNoSuchClient)
+
+    @property
+    def load_failure(self):
+        """Unable to load internal client."""
+        return self._hasflag(_lib.JackLoadFailure)
+
+    @property
+    def init_failure(self):
+        """Unable to initialize client."""
+        return self._hasflag(_lib.JackInitFailure)
+
+    @property
+    def shm_failure(self):
+        """Unable to access shared memory."""
+        return self._hasflag(_lib.JackShmFailure)
+
+    @property
+    def version_error(self):
+        """Client's protocol version does not match."""
+        return self._hasflag(_lib.JackVersionError)
+
+    @property
+    def backend_error(self):
+        """Backend error."""
+        return self._hasflag(_lib.JackBackendError)
+
+    @property
+    def client_zombie(self):
+        """Client zombified failure."""
+        return self._hasflag(_lib.JackClientZombie)
+
+    def _hasflag(self, flag):
+        """Helper function for Status properties."""
+        return bool(self._code & flag)
+
+
+class TransportState:
+    """Representation of the JACK transport state.
+
+    See Also
+    --------
+    `Client.transport_state`, :meth:`Client.transport_query`
+
+    """
+
+    __slots__ = '_code'
+
+    def __init__(self, code):
+        self._code = code
+
+    def __eq__(self, other):
+        return self._code == other
+
+    def __hash__(self):
+        return hash(self._code)
+
+    def __repr__(self):
+        return 'jack.' + {
+            _lib.JackTransportStopped: 'STOPPED',
+            _lib.JackTransportRolling: 'ROLLING',
+            _lib.JackTransportStarting: 'STARTING',
+            _lib.JackTransportNetStarting: 'NETSTARTING',
+        }[self._code]
+
+
+class ProcessTiming:
+    """Durations of the process callback.
+
+    See ``Client.set_process_callback(..., timing=True)`` and
+    `Client.process_timing`.  All durations are given in seconds.
+
+    The durations of the most recent calls are kept for computing
+    `quantiles()`.
+
+    """
+
+    # The values are the docstrings of the attributes:
+    __slots__ = {
+        'count': 'Number of calls.',
+        'total': 'Sum of all durations.',
+        'max': 'Longest duration.',
+        'last': 'Duration of the most recent call.',
+        '_peak': None,  # Maximum since the last HealthSampler sample
+        '_recent': None,
+    }
+
+    def __init__(self, size=1024):
+        self._recent = [0.0] * size
+        self.reset()
+
+    def __repr__(self):
+        return '<jack.ProcessTiming: {} calls, mean {:.6f}, max {:.6f}>'\
+            .format(self.count, self.mean, self.max)
+
+    @property
+    def mean(self):
+        """Mean duration."""
+        return self.total / self.count if self.count else 0.0
+
+    def quantiles(self, *qs):
+        """Get quantiles of the most recent durations.
+
+        Parameters
+        ----------
+        *qs : float
+            Values between 0 and 1, e.g. ``0.5`` for the median.
+
+        Returns
+        -------
+        list of float
+            One duration per given value, all ``0.0`` if the callback
+            has not been called yet.
+
+        """
+        recent = sorted(self._recent[:self.count])
+        if not recent:
+            return [0.0] * len(qs)
+        last = len(recent) - 1
+        return [recent[round(q * last)] for q in qs]
+
+    def reset(self):
+        """Set all values to zero."""
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self._peak = 0.0
+
+
+class HealthSampler:
+    """Periodically collect health information of a client.
+
+    A background thread samples the following values, which are kept
+    in rolling windows of fixed size (see `values()` and `stats()`):
+
+    ``'cpu_load'``
+        See `Client.cpu_load()`.
+    ``'xruns'``
+        Number of xruns since the previous sample.
+    ``'process_time'``, ``'process_time_max'``
+        Mean and maximum duration (in seconds) of the process callback
+        since the previous sample.  This is only available if
+        ``Client.set_process_callback(..., timing=True)`` was called
+        before creating the sampler.
+    names of *ringbuffers*
+        Fill level of each ringbuffer (between 0 and 1).
+
+    Xruns are only reported while the client is active.
+
+    """
+
+    def __init__(self, client, interval=1.0, window=600, ringbuffers=None):
+        """Create a sampler (which is not yet running).
+
+        Parameters
+        ----------
+        client : Client
+            The client to be monitored.
+        interval : float, optional
+            Time between samples in seconds.
+        window : int, optional
+            Number of samples kept for each value.
+        ringbuffers : dict, optional
+            A mapping from names to `RingBuffer` objects.
+
+        """
+        self._client = client
+        self._interval = interval
+        self._window = window
+        self._ringbuffers = dict(ringbuffers or {})
+        self._timing = client.process_timing
+        names = ['cpu_load', 'xruns']
+        if self._timing is not None:
+            names += ['process_time', 'process_time_max']
+        names += self._ringbuffers
+        self._values = {name: [0.0] * window for name in names}
+        self._samples = 0
+        self._xruns = 0
+        self._lock = _threading.Lock()
+        self._stop = _threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def names(self):
+        """Names of the sampled values."""
+        return list(self._values)
+
+    def start(self):
+        """Start sampling in a background thread."""
+        if self._thread is not None:
+            raise RuntimeError('HealthSampler is already running')
+        self._client._listeners.append(self._update)
+        self._stop.clear()
+        self._thread = _threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling.  The collected values are kept."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._client._listeners.remove(self._update)
+
+    def values(self, name):
+        """Get the collected values of *name*, oldest first."""
+        with self._lock:
+            values = self._values[name]
+            number = min(self._samples, self._window)
+            start = self._samples - number
+            return [values[(start + i) % self._window]
+                    for i in range(number)]
+
+    def stats(self, name):
+        """Get a summary of the collected values of *name*.
+
+        Returns
+        -------
+        dict
+            Minimum, mean, maximum, median and 90th/99th percentile
+            (with the keys ``'min'``, ``'mean'``, ``'max'``, ``'p50'``,
+            ``'p90'`` and ``'p99'``), all ``None`` if there are no
+            samples yet.
+
+        """
+        values = sorted(self.values(name))
+        keys = 'min', 'mean', 'max', 'p50', 'p90', 'p99'
+        if not values:
+            return dict.fromkeys(keys)
+        last = len(values) - 1
+        return dict(zip(keys, (
+            values[0],
+            sum(values) / len(values),
+            values[-1],
+            values[round(0.5 * last)],
+            values[round(0.9 * last)],
+            values[round(0.99 * last)],
+        )))
+
+    def _run(self):
+        """Background thread for sampling."""
+        timing = self._timing
+        count = total = 0
+        if timing is not None:
+            count, total = timing.count, timing.total
+            timing._peak = 0.0
+        while not self._stop.wait(self._interval):
+            sample = {
+                'cpu_load': self._client.cpu_load(),
+                'xruns': self._xruns,
+            }
+            self._xruns = 0
+            if timing is not None:
+                calls = timing.count - count
+                sample['process_time'] = (
+                    (timing.total - total) / calls if calls else 0.0)
+                sample['process_time_max'] = timing._peak
+                timing._peak = 0.0
+                count, total = timing.count, timing.total
+            for name, rb in self._ringbuffers.items():
+                sample[name] = rb.read_space / rb.size
+            with self._lock:
+                idx = self._samples % self._window
+                for name, value in sample.items():
+                    self._values[name][idx] = value
+                self._samples += 1
+
+    def _update(self, event, *args):
+        """Listener for notifications from Client."""
+        if event == 'xrun':
+            self._xruns += 1
+
+
+class DeadlineMonitor:
+    """Detect process callbacks that take too much of the period budget.
+
+    This is created by ``Client.set_process_callback(...,
+    deadline=...)`` and can be obtained via `Client.deadline_monitor`.
+
+    A watchdog thread checks every `interval` seconds whether the
+    process callback has been running for longer than the threshold
+    (the given fraction of `Client.blocksize` / `Client.samplerate`).
+    If so, it takes a snapshot of the call stack of the process thread.
+    Note that this is only possible when the process thread releases
+    the GIL (see ``sys.setswitchinterval()``), so for short calls there
+    might be no stack.  While no process callbacks are happening (e.g.
+    when the client is not active), the watchdog thread sleeps.
+
+    Each call that exceeded the threshold is reported as a
+    `DeadlineMiss`.  The reports are created in the watchdog thread,
+    stored in `misses` and passed to the function given to
+    `set_callback()`.
+
+    """
+
+    def __init__(self, client, fraction, maxlen=100):
+        self._client = client
+        self._fraction = fraction
+        self._blocksize = client.blocksize
+        self._samplerate = client.samplerate
+        self._budget = 0.0
+        self._threshold = 0.0
+        self._interval = 0.01
+        self._cycle = 0
+        self._started = None
+        self._thread_id = None
+        self._idle = False
+        self._finished = _deque()
+        self._misses = _deque(maxlen=maxlen)
+        self._callback = None
+        self._stop = _threading.Event()
+        self._resume = _threading.Event()
+        self._thread = None
+        self._update_threshold()
+
+    @property
+    def fraction(self):
+        """Fraction of the period budget that triggers a report."""
+        return self._fraction
+
+    @property
+    def threshold(self):
+        """Current threshold in seconds."""
+        return self._threshold
+
+    @property
+    def interval(self):
+        """Time (in seconds) between checks of the watchdog thread.
+
+        Shorter intervals allow taking stack snapshots of shorter
+        calls, but the watchdog thread competes with the process
+        callback for the GIL.  The default is 10 milliseconds.
+
+        """
+        return self._interval
+
+    @interval.setter
+    def interval(self, interval):
+        if not interval > 0:
+            raise ValueError('interval must be positive')
+        self._interval = interval
+
+    @property
+    def misses(self):
+        """List of the most recent `DeadlineMiss` reports."""
+        return list(self._misses)
+
+    def set_callback(self, callback):
+        """Register a function that is called with each `DeadlineMiss`.
+
+        The function is called from the watchdog thread, it must not
+        block for long.  Use ``None`` to unregister.
+
+        """
+        self._callback = callback
+
+    def stop(self):
+        """Stop the watchdog thread."""
+        if self._thread is None:
+            return
+        self._client._listeners.remove(self._update)
+        self._stop.set()
+        self._resume.set()
+        if self._thread is not _threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _wrap(self, callback):
+        """Return a process callback that measures *callback*."""
+        perf_counter = _time.perf_counter
+        get_ident = _threading.get_ident
+        finished = self._finished
+        client = self._client
+
+        def process(frames):
+            self._cycle += 1
+            if self._idle:
+                self._idle = False
+                self._resume.set()
+            self._thread_id = get_ident()
+            self._started = start = perf_counter()
+            try:
+                callback(frames)
+            finally:
+                duration = perf_counter() - start
+                if duration > self._threshold:
+                    finished.append((
+                        self._cycle,
+                        _lib.jack_last_frame_time(client._ptr),
+                        duration))
+                # After appending, so that the watchdog doesn't go idle
+                # before reporting
+                self._started = None
+        return process
+
+    def _start(self):
+        self._client._listeners.append(self._update)
+        self._stop.clear()
+        self._thread = _threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _update_threshold(self):
+        self._budget = self._blocksize / self._samplerate
+        self._threshold = self._fraction * self._budget
+
+    def _update(self, event, *args):
+        """Listener for notifications from Client."""
+        if event == 'blocksize':
+            self._blocksize = args[0]
+        elif event == 'samplerate':
+            self._samplerate = args[0]
+        else:
+            return
+        self._update_threshold()
+
+    def _run(self):
+        """Watchdog thread."""
+        stacks = {}
+        captured = None
+        previous = self._cycle
+        while not self._stop.wait(self._interval):
+            cycle = self._cycle
+            started = self._started
+            if (started is not None and cycle != captured and
+                    _time.perf_counter() - started > self._threshold):
+                frame = _sys._current_frames().get(self._thread_id)
+                # The cycle may have ended in the meantime
+                if frame is not None and self._cycle == cycle:
+                    stacks[cycle] = _traceback.extract_stack(frame)
+                    captured = cycle
+                del frame
+            while self._finished:
+                missed, frame_time, duration = self._finished.popleft()
+                miss = DeadlineMiss(missed, frame_time, duration,
+                                    self._budget, stacks.pop(missed, None))
+                self._misses.append(miss)
+                callback = self._callback
+                if callback is not None:
+                    callback(miss)
+            for key in [key for key in stacks if key < cycle]:
+                del stacks[key]
+            if started is None and cycle == previous:
+                # No process callbacks since the last check, wait for the
+                # next one (see _wrap())
+                self._resume.clear()
+                self._idle = True
+                if self._cycle == cycle:
+                    self._resume.wait()
+                self._idle = False
+            previous = cycle
+
+
+class DeadlineMiss:
+    """Report of a slow process callback, see `DeadlineMonitor`."""
+
+    # The values are the docstrings of the attributes:
+    __slots__ = {
+        'cycle': 'Number of the call (starting with 1).',
+        'frame_time': 'See `Client.last_frame_time`.',
+        'duration': 'Duration of the call in seconds.',
+        'budget': 'Period budget in seconds.',
+        'stack': (
+            '``traceback.StackSummary`` of the process thread during the '
+            'call (or ``None`` if no snapshot could be taken).'),
+    }
+
+    def __init__(self, cycle, frame_time, duration, budget, stack):
+        self.cycle = cycle
+        self.frame_time = frame_time
+        self.duration = duration
+        self.budget = budget
+        self.stack = stack
+
+    def __repr__(self):
+        return '<jack.DeadlineMiss: cycle {}, {:.1%} of budget>'.format(
+            self.cycle, self.duration / self.budget)
+
+
+class MetricsExporter:
+    """Serve health metrics of a client in the OpenMetrics text format.
+
+    The metrics can be scraped by Prometheus (and compatible tools)
+    via HTTP, either on a TCP port or on a Unix domain socket.  All
+    values are collected when a request arrives, the process callback
+    is only involved if *midi_ports* are given (see `process()`).
+
+    The following metrics are available (the names are prefixed with
+    *prefix* and an underscore):
+
+    ``cpu_load``
+        See `Client.cpu_load()` (in percent).
+    ``xruns``
+        Number of xruns while the exporter was running (a counter).
+    ``xrun_delay_seconds``
+        Delay of the most recent xrun.
+    ``max_delayed_seconds``
+        See `Client.max_delayed_usecs()`.
+    ``process_time_seconds``
+        Durations of the process callback (a summary with quantiles),
+        only if ``Client.set_process_callback(..., timing=True)`` was
+        used, see `ProcessTiming`.
+    ``ringbuffer_fill_ratio``, ``ringbuffer_read_space_bytes``
+        Fill level of each of the given *ringbuffers*.
+    ``midi_lost_events``
+        Number of lost events of each of the given *midi_ports* (a
+        counter).
+    ``ports``, ``connections``
+        Number of ports and connections known to the JACK server.
+
+    """
+
+    content_type = 'application/openmetrics-text; version=1.0.0; ' \
+        'charset=utf-8'
+
+    quantiles = 0.5, 0.9, 0.99, 0.999
+
+    def __init__(self, client, address, ringbuffers=None, midi_ports=(),
+                 prefix='jack'):
+        """Create an exporter (which is not yet running).
+
+        Parameters
+        ----------
+        client : Client
+            The client to be monitored.
+        address : tuple or str
+            Either a ``(host, port)`` tuple (e.g. ``('127.0.0.1',
+            9100)``) or the file name of a Unix domain socket.
+            Port ``0`` selects an arbitrary free port, see `address`.
+        ringbuffers : dict, optional
+            A mapping from names to `RingBuffer` objects.
+        midi_ports : sequence of OwnMidiPort, optional
+            MIDI ports whose lost events should be counted.  This
+            needs `process()` to be called from the process callback.
+        prefix : str, optional
+            Prefix of all metric names.
+
+        """
+        self._client = client
+        self._address = address
+        self._ringbuffers = dict(ringbuffers or {})
+        self._midi_ports = list(midi_ports)
+        self._lost = [0] * len(self._midi_ports)
+        self._prefix = prefix
+        self._xruns = 0
+        self._xrun_delay = 0.0
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def address(self):
+        """The address the exporter is listening on (or ``None``)."""
+        if self._server is None:
+            return None
+        return self._server.server_address
+
+    def start(self):
+        """Start serving requests in a background thread."""
+        if self._server is not None:
+            raise RuntimeError('MetricsExporter is already running')
+        exporter = self
+
+        class Handler(_http_server.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', exporter.content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        if isinstance(self._address, str):
+            # Not available on all platforms (e.g. Windows):
+            if not hasattr(_socketserver, 'UnixStreamServer'):
+                raise ValueError(
+                    'Unix domain sockets are not supported on this platform')
+
+            class UnixHTTPServer(_socketserver.ThreadingMixIn,
+                                 _socketserver.UnixStreamServer):
+
+                daemon_threads = True
+
+                def get_request(self):
+                    request, _ = super().get_request()
+                    # BaseHTTPRequestHandler expects an (address, port) pair
+                    return request, ('', 0)
+
+            server = UnixHTTPServer(self._address, Handler)
+        else:
+            server = _http_server.ThreadingHTTPServer(self._address, Handler)
+        self._server = server
+        self._client._listeners.append(self._update)
+        self._thread = _threading.Thread(
+            target=server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving requests and close the socket."""
+        if self._server is None:
+            return
+        self._client._listeners.remove(self._update)
+        self._server.shutdown()
+        self._thread.join()
+        self._server.server_close()
+        if isinstance(self._address, str):
+            try:
+                _os.remove(self._address)
+            except FileNotFoundError:
+                pass
+        self._server = None
+        self._thread = None
+
+    def process(self, frames):
+        """Count lost MIDI events.
+
+        This must be called from the process callback, but only if
+        *midi_ports* were given.
+
+        """
+        for idx, port in enumerate(self._midi_ports):
+            lost = port.lost_midi_events
+            if lost:
+                self._lost[idx] += lost
+
+    def render(self):
+        """Return all metrics as OpenMetrics text."""
+        lines = []
+        prefix = self._prefix + '_'
+
+        def add(name, type, help, samples):
+            lines.append('# TYPE {}{} {}'.format(prefix, name, type))
+            lines.append('# HELP {}{} {}'.format(prefix, name, help))
+            for suffix, labels, value in samples:
+                labels = ','.join('{}="{}"'.format(k, _escape_label(v))
+                                  for k, v in labels)
+                if labels:
+                    labels = '{' + labels + '}'
+                lines.append('{}{}{}{} {!r}'.format(
+                    prefix, name, suffix, labels, value))
+
+        client = self._client
+        add('cpu_load', 'gauge', 'DSP load of the JACK server in percent.',
+            [('', (), client.cpu_load())])
+        add('xruns', 'counter', 'Number of xruns.',
+            [('_total', (), self._xruns)])
+        add('xrun_delay_seconds', 'gauge', 'Delay of the most recent xrun.',
+            [('', (), self._xrun_delay)])
+        add('max_delayed_seconds', 'gauge', 'Maximum delay of the server.',
+            [('', (), client.max_delayed_usecs() / 1e6)])
+        timing = client.process_timing
+        if timing is not None:
+            count, total = timing.count, timing.total
+            values = timing.quantiles(*self.quantiles)
+            add('process_time_seconds', 'summary',
+                'Duration of the process callback.',
+                [('', [('quantile', repr(q))], v)
+                 for q, v in zip(self.quantiles, values)] +
+                [('_count', (), count), ('_sum', (), total)])
+        if self._ringbuffers:
+            items = [(name, rb.read_space, rb.size)
+                     for name, rb in self._ringbuffers.items()]
+            add('ringbuffer_fill_ratio', 'gauge', 'Fill level of ringbuffer.',
+                [('', [('name', name)], space / size)
+                 for name, space, size in items])
+            add('ringbuffer_read_space_bytes', 'gauge',
+                'Bytes available for reading from ringbuffer.',
+                [('', [('name', name)], space)
+                 for name, space, _ in items])
+        if self._midi_ports:
+            add('midi_lost_events', 'counter',
+                'Number of events that could not be written to the port.',
+                [('_total', [('port', port.name)], lost)
+                 for port, lost in zip(self._midi_ports, self._lost)])
+        ports = client.get_ports()
+        connections = sum(len(client.get_all_connections(port))
+                          for port in ports if port.is_output)
+        add('ports', 'gauge', 'Number of ports.', [('', (), len(ports))])
+        add('connections', 'gauge', 'Number of connections.',
+            [('', (), connections)])
+        lines.append('# EOF\n')
+        return '\n'.join(lines)
+
+    def _update(self, event, *args):
+        """Listener for notifications from Client."""
+        if event == 'xrun':
+            self._xruns += 1
+            self._xrun_delay = args[0] / 1e6
+
+
+class CycleTracer:
+    """Record a timeline of the process callback.
+
+    Fixed-size records are written into a preallocated ring from
+    within the process callback.  They can be exported in the Chrome
+    trace event format (see `events()` and `dump()`), which can be
+    viewed with ``chrome://tracing`` or https://ui.perfetto.dev/.  With
+    `start()`, a background thread continuously writes the records to
+    a file.
+
+    The process callback can be wrapped with `wrap()`, which marks the
+    begin and end of each cycle, e.g.::
+
+        tracer = jack.CycleTracer(client)
+
+        def process(frames):
+            with tracer.span('mix'):
+                ...
+            tracer.midi('events', count)
+
+        client.set_process_callback(tracer.wrap(process))
+
+        with client, tracer.start('trace.json'):
+            input('Press Return to stop tracing ...')
+
+    """
+
+    def __init__(self, client, size=2**16):
+        """Create a tracer.
+
+        Parameters
+        ----------
+        client : Client
+            The client whose process callback is traced.
+        size : int, optional
+            Number of records in the ring.
+
+        Attributes
+        ----------
+        dropped
+            Number of records that were overwritten before they could
+            be written by the background thread.
+        error
+            Exception raised in the background thread (if any).
+
+        """
+        self._client = client
+        self._size = size
+        self._phases = [None] * size
+        self._times = [0.0] * size
+        self._names = [None] * size
+        self._values = [None] * size
+        self._count = 0
+        self._read = 0
+        self._spans = {}
+        self._origin = _time.perf_counter()
+        self._thread = None
+        self._stop = _threading.Event()
+        self.dropped = 0
+        self.error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def wrap(self, callback):
+        """Return a process callback that traces each cycle.
+
+        The returned function calls `begin_cycle()`, then *callback*
+        and finally `end_cycle()`.
+
+        """
+        def process(frames):
+            self.begin_cycle(frames)
+            try:
+                callback(frames)
+            finally:
+                self.end_cycle()
+        return process
+
+    def begin_cycle(self, frames):
+        """Mark the begin of a cycle (in the process callback)."""
+        self._record('B', 'cycle', frames)
+
+    def end_cycle(self):
+        """Mark the end of a cycle (in the process callback)."""
+        self._record('E', 'cycle', None)
+
+    def begin(self, name):
+        """Mark the begin of a span called *name*."""
+        self._record('B', name, None)
+
+    def end(self, name):
+        """Mark the end of a span called *name*."""
+        self._record('E', name, None)
+
+    def span(self, name):
+        """Return a context manager that marks a span called *name*.
+
+        The context manager is created only once for each *name*.
+
+        """
+        span = self._spans.get(name)
+        if span is None:
+            span = self._spans[name] = _Span(self, name)
+        return span
+
+    def get_array(self, port):
+        """Call ``port.get_array()`` and record the time it takes."""
+        start = _time.perf_counter()
+        array = port.get_array()
+        self._record('X', port.shortname, _time.perf_counter() - start,
+                     start)
+        return array
+
+    def get_buffer(self, port):
+        """Call ``port.get_buffer()`` and record the time it takes."""
+        start = _time.perf_counter()
+        buffer = port.get_buffer()
+        self._record('X', port.shortname, _time.perf_counter() - start,
+                     start)
+        return buffer
+
+    def midi(self, name, count):
+        """Record a number of MIDI events (or any other counter)."""
+        self._record('C', name, count)
+
+    def events(self):
+        """Return the records currently in the ring as trace events.
+
+        Returns
+        -------
+        list of dict
+            Chrome trace events, oldest first.
+
+        """
+        count = self._count
+        start = max(count - self._size, 0)
+        events = [self._event(i % self._size) for i in range(start, count)]
+        overwritten = self._count - self._size - start
+        return events[max(overwritten, 0):]
+
+    def dump(self, file):
+        """Write the records currently in the ring to a JSON file.
+
+        Parameters
+        ----------
+        file : str or file-like
+            File name or text file object.
+
+        """
+        data = {'traceEvents': self._metadata() + self.events(),
+                'displayTimeUnit': 'ms'}
+        if isinstance(file, str):
+            with open(file, 'w') as f:
+                _json.dump(data, f)
+        else:
+            _json.dump(data, file)
+
+    def start(self, filename, interval=0.5):
+        """Continuously write records to a file in a background thread.
+
+        Only records created after calling this method are written.
+
+        Parameters
+        ----------
+        filename : str
+            Name of the JSON file.
+        interval : float, optional
+            Time (in seconds) between writes.
+
+        Returns
+        -------
+        CycleTracer
+            The tracer itself, which can be used as context manager.
+
+        """
+        if self._thread is not None:
+            raise RuntimeError('CycleTracer is already running')
+        f = open(filename, 'w')
+        self._read = self._count
+        self._stop.clear()
+        self.error = None
+        self._thread = _threading.Thread(
+            target=self._run, args=(f, interval), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the background thread and close the file."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _record(self, phase, name, value, timestamp=None):
+        """Write one record into the ring (in the process callback)."""
+        if timestamp is None:
+            timestamp = _time.perf_counter()
+        idx = self._count % self._size
+        self._phases[idx] = phase
+        self._times[idx] = timestamp
+        self._names[idx] = name
+        self._values[idx] = value
+        self._count += 1
+
+    def _event(self, idx):
+        """Convert one record into a trace event."""
+        phase = self._phases[idx]
+        value = self._values[idx]
+        event = {
+            'name': self._names[idx],
+            'ph': phase,
+            'ts': (self._times[idx] - self._origin) * 1e6,
+            'pid': 0,
+            'tid': 0,
+        }
+        if phase == 'X':
+            event['dur'] = value * 1e6
+        elif phase == 'C':
+            event['args'] = {'count': value}
+        elif value is not None:
+            event['args'] = {'frames': value}
+        return event
+
+    def _metadata(self):
+        """Trace events for naming process and thread."""
+        return [
+            {'name': 'process_name', 'ph': 'M', 'pid': 0, 'tid': 0,
+             'args': {'name': self._client.name}},
+            {'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': 0,
+             'args': {'name': 'process callback'}},
+        ]
+
+    def _drain(self):
+        """Return trace events for all records since the last call."""
+        count = self._count
+        start = max(self._read, count - self._size)
+        self.dropped += start - self._read
+        events = [self._event(i % self._size) for i in range(start, count)]
+        overwritten = self._count - self._size - start
+        if overwritten > 0:
+            events = events[overwritten:]
+            self.dropped += overwritten
+        self._read = count
+        return events
+
+    def _run(self, f, interval):
+        """Background thread for writing the trace file.
+
+        This uses the JSON array format, where the closing bracket is
+        optional, so the file is valid even if it is not closed.
+
+        """
+        try:
+            with f:
+                separator = '[\n'
+                for event in self._metadata():
+                    f.write(separator + _json.dumps(event))
+                    separator = ',\n'
+                while True:
+                    stopping = self._stop.wait(interval)
+                    for event in self._drain():
+                        f.write(separator + _json.dumps(event))
+                    f.flush()
+                    if stopping:
+                        break
+                f.write('\n]\n')
+        except Exception as e:
+            self.error = e
+
+
+class _Span:
+    """Context manager for `CycleTracer.span()`."""
+
+    __slots__ = '_tracer', '_name'
+
+    def __init__(self, tracer, name):
+        self._tracer = tracer
+        self._name = name
+
+    def __enter__(self):
+        self._tracer._record('B', self._name, None)
+
+    def __exit__(self, *args):
+        self._tracer._record('E', self._name, None)
+
+
+class XrunTracker:
+    """Records information about xruns.
+
+    This class cannot be instantiated directly, see
+    `Client.xrun_tracker()`.
+
+    For each xrun, the time (see ``time.monotonic()``), the delay in
+    microseconds (see `Client.set_xrun_callback()`), the frame time
+    (see `Client.last_frame_time`) and the transport state are stored
+    in a ring of fixed size.
+
+    Attributes
+    ----------
+    count
+        Total number of xruns since the tracker was created (or reset).
+
+    """
+
+    def __init__(self, client, size):
+        self._client = client
+        self._size = size
+        self._times = [0.0] * size
+        self._delays = [0.0] * size
+        self._frames = [0] * size
+        self._states = [0] * size
+        self._lock = _threading.Lock()
+        self._start = _time.monotonic()
+        self.count = 0
+        self._closed = False
+        client._listeners.append(self._update)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self):
+        return f'<jack.XrunTracker: {self.count} xruns>'
+
+    @property
+    def max_delayed_usecs(self):
+        """See `Client.max_delayed_usecs()`."""
+        return self._client.max_delayed_usecs()
+
+    def records(self):
+        """Get the stored xruns, oldest first.
+
+        Returns
+        -------
+        list of tuple
+            ``(time, delayed_usecs, frame_time, transport_state)``
+            tuples.
+
+        """
+        with self._lock:
+            number = min(self.count, self._size)
+            indices = [(self.count - number + i) % self._size
+                       for i in range(number)]
+            return [(self._times[i], self._delays[i], self._frames[i],
+                     self._states[i]) for i in indices]
+
+    def rate(self, window=None):
+        """Get the number of xruns per second.
+
+        Parameters
+        ----------
+        window : float, optional
+            Only consider the given number of most recent seconds.
+            By default, all xruns since the tracker was created (or
+            reset) are considered.  Only stored xruns can be considered,
+            so the result may be too small if the ring overflowed within
+            *window*.
+
+        """
+        now = _time.monotonic()
+        if window is None:
+            return self.count / max(now - self._start, 1e-9)
+        start = now - window
+        number = sum(1 for record in self.records() if record[0] >= start)
+        return number / window
+
+    def histogram(self, edges=(100, 500, 1000, 5000, 10000)):
+        """Count the stored xruns by their delay.
+
+        Parameters
+        ----------
+        edges : sequence of float
+            Increasing bin edges in microseconds.
+
+        Returns
+        -------
+        list of int
+            ``len(edges) + 1`` counts.  The first bin contains delays
+            below ``edges[0]``, the last one delays of at least
+            ``edges[-1]``.
+
+        """
+        counts = [0] * (len(edges) + 1)
+        for record in self.records():
+            counts[_bisect.bisect_right(edges, record[1])] += 1
+        return counts
+
+    def reset(self):
+        """Forget all xruns and reset the maximum delay.
+
+        See `Client.reset_max_delayed_usecs()`.
+
+        """
+        with self._lock:
+            self.count = 0
+            self._start = _time.monotonic()
+        self._client.reset_max_delayed_usecs()
+
+    def close(self):
+        """Stop recording xruns.
+
+        A tracker can also be used as a *context manager* in a *with
+        statement*, which calls `close()` on exit.
+
+        """
+        if not self._closed:
+            self._closed = True
+            self._client._listeners.remove(self._update)
+
+    def _update(self, event, *args):
+        """Listener for notifications from Client."""
+        if event != 'xrun':
+            return
+        client_ptr = self._client._ptr
+        now = _time.monotonic()
+        frame = _lib.jack_last_frame_time(client_ptr)
+        state = _lib.jack_transport_query(client_ptr, _ffi.NULL)
+        with self._lock:
+            i = self.count % self._size
+            self._times[i] = now
+            self._delays[i] = args[0]
+            self._frames[i] = frame
+            self._states[i] = state
+            self.count += 1
+
+
+class TransportSnapshot:
+    """Transport state and position, updated in place.
+
+    This class cannot be instantiated directly, see
+    `Client.transport_snapshot()`.
+
+    The extended position information (`bbt`, `timecode` etc.) is
+    ``None`` if it is not provided by the timebase master.
+
+    """
+
+    # The values are the docstrings of the attributes:
+    __slots__ = {
+        'state': (
+            'The transport state, one of `STOPPED`, `ROLLING`, '
+            '`STARTING` and `NETSTARTING`.'),
+        'position': (
+            'The position structure (``jack_position_t``), see '
+            '`Client.transport_query_struct()`.'),
+        'changed': (
+            '``True`` if the transport state, the tempo or the meter '
+            'have changed since the previous update, or if the transport '
+            'was relocated (i.e. the position did not advance by the '
+            'number of frames that have passed since the previous '
+            'update).  This is also ``True`` after the first update.'),
+        '_client': None,
+        '_previous': None,
+        '_cycle_frame': None,
+    }
+
+    def __init__(self, client):
+        self._client = client
+        self.position = _ffi.new('jack_position_t*')
+        self._previous = _ffi.new('jack_position_t*')
+        self.state = None
+        self._cycle_frame = 0
+        self.update()
+
+    def __repr__(self):
+        return '<jack.TransportSnapshot: {!r}, frame {}>'.format(
+            TransportState(self.state), self.position.frame)
+
+    def update(self):
+        """Query the current transport state and position again."""
+        pos, prev = self.position, self._previous
+        prev[0] = pos[0]
+        previous_state = self.state
+        self.state = _lib.jack_transport_query(self._client._ptr, pos)
+        previous_cycle_frame = self._cycle_frame
+        self._cycle_frame = _lib.jack_last_frame_time(self._client._ptr)
+        expected = prev.frame
+        if previous_state == _lib.JackTransportRolling:
+            expected += self._cycle_frame - previous_cycle_frame
+        self.changed = bool(
+            self.state != previous_state
+            or pos.frame != expected & 0xFFFFFFFF
+            or pos.valid != prev.valid
+            or (pos.valid & _lib.JackPositionBBT
+                and (pos.beats_per_minute != prev.beats_per_minute
+                     or pos.beats_per_bar != prev.beats_per_bar
+                     or pos.beat_type != prev.beat_type
+                     or pos.ticks_per_beat != prev.ticks_per_beat)))
+
+    @property
+    def frame(self):
+        """Transport position in frames."""
+        return self.position.frame
+
+    @property
+    def frame_rate(self):
+        """Current frame rate (per second)."""
+        return self.position.frame_rate
+
+    @property
+    def rolling(self):
+        """``True`` if the transport state is `ROLLING`."""
+        return self.state == _lib.JackTransportRolling
+
+    @property
+    def bbt(self):
+        """Tuple ``(bar, beat, tick)``, bar and beat start at 1."""
+        pos = self.position
+        if pos.valid & _lib.JackPositionBBT:
+            return pos.bar, pos.beat, pos.tick
+        return None
+
+    @property
+    def bar_start_tick(self):
+        """Number of ticks that have elapsed before the current bar."""
+        pos = self.position
+        return pos.bar_start_tick if pos.valid & _lib.JackPositionBBT else None
+
+    @property
+    def meter(self):
+        """Tuple ``(beats_per_bar, beat_type)``."""
+        pos = self.position
+        if pos.valid & _lib.JackPositionBBT:
+            return pos.beats_per_bar, pos.beat_type
+        return None
+
+    @property
+    def tempo(self):
+        """Tempo in beats per minute."""
+        pos = self.position
+        if pos.valid & _lib.JackPositionBBT:
+            return pos.beats_per_minute
+        return None
+
+    @property
+    def ticks_per_beat(self):
+        """Number of ticks per beat."""
+        pos = self.position
+        return pos.ticks_per_beat if pos.valid & _lib.JackPositionBBT else None
+
+    @property
+    def timecode(self):
+        """Tuple ``(frame_time, next_time)`` in seconds."""
+        pos = self.position
+        if pos.valid & _lib.JackPositionTimecode:
+            return pos.frame_time, pos.next_time
+        return None
+
+    @property
+    def bbt_offset(self):
+        """Frame offset of the BBT information."""
+        pos = self.position
+        return pos.bbt_offset if pos.valid & _lib.JackBBTFrameOffset else None
+
+    @property
+    def video_offset(self):
+        """Frame offset of the next video frame."""
+        pos = self.position
+        if pos.valid & _lib.JackVideoFrameOffset:
+            return pos.video_offset
+        return None
+
+    @property
+    def audio_frames_per_video_frame(self):
+        """Number of audio frames per video frame."""
+        pos = self.position
+        if pos.valid & _lib.JackAudioVideoRatio:
+            return pos.audio_frames_per_video_frame
+        return None
+
+
+class TimebaseMaster:
+    """A ready-made JACK timebase master providing BBT information.
+
+    Bar, beat and tick are computed from the transport frame in each
+    cycle, using values that were prepared in advance.  Changes of
+    tempo and meter (see `configure()` and `set_tempo_map()`) are
+    prepared outside of the realtime thread and swapped in as a whole,
+    they take effect at the start of the next cycle.
+
+    Parameters
+    ----------
+    client : Client
+        The client that acts as timebase master.
+    tempo : float, optional
+        Tempo in beats per minute.
+    beats_per_bar, beat_type : float, optional
+        The meter, e.g. 6/8 is ``beats_per_bar=6, beat_type=8``.
+    ticks_per_beat : float, optional
+        Resolution of the *tick* field.
+
+    See Also
+    --------
+    Client.set_timebase_callback, TempoMap
+
+    """
+
+    def __init__(self, client, tempo=120.0, beats_per_bar=4.0, beat_type=4.0,
+                 ticks_per_beat=1920.0):
+        self._client = client
+        self._timebase = _Timebase(tempo, beats_per_bar, beat_type,
+                                   ticks_per_beat)
+        self._timebase.anchor(0, 0, 0.0, 0.0)
+        self._current = self._timebase
+        self._segment = self._timebase
+
+    @property
+    def tempo(self):
+        """Tempo in beats per minute.
 
-        Two are needed because the data to be read may be split across
-        the end of the ringbuffer.  Either of them could be 0 length.
+        If a `TempoMap` is used, this is the tempo of the most recent
+        cycle.
 
-        This can be used as a no-copy version of `peek()` or `read()`.
+        """
+        return self._settings().tempo
 
-        When finished with reading, `read_advance()` should be used.
+    @property
+    def meter(self):
+        """Tuple ``(beats_per_bar, beat_type)``.
 
-        .. note:: After an operation that changes the read pointer
-           (`read()`, `read_advance()`, `reset()`), the buffers are no
-           longer valid and one should use this property again to get
-           new ones.
+        If a `TempoMap` is used, this is the meter of the most recent
+        cycle.
 
         """
-        vectors = _ffi.new('jack_ringbuffer_data_t[2]')
-        _lib.jack_ringbuffer_get_read_vector(self._ptr, vectors)
-        return (
-            _ffi.buffer(vectors[0].buf, vectors[0].len),
-            _ffi.buffer(vectors[1].buf, vectors[1].len)
-        )
+        settings = self._settings()
+        return settings.beats_per_bar, settings.beat_type
 
-    def read_advance(self, size):
-        """Advance the read pointer.
+    @property
+    def ticks_per_beat(self):
+        """Resolution of the *tick* field."""
+        return self._settings().ticks_per_beat
 
-        After data has been read from the ringbuffer using
-        `read_buffers` or `peek()`, use this method to advance the
-        buffer pointers, making that space available for future write
-        operations.
+    @property
+    def tempo_map(self):
+        """The `TempoMap` in use, or ``None``."""
+        timebase = self._timebase
+        return timebase if isinstance(timebase, TempoMap) else None
 
-        Parameters
-        ----------
-        size : int
-            The number of bytes to advance.
+    def start(self, conditional=False):
+        """Register as timebase master.
 
-        """
-        _lib.jack_ringbuffer_read_advance(self._ptr, size)
+        See `Client.set_timebase_callback()` for the meaning of
+        *conditional* and the return value.
 
-    def mlock(self):
-        """Lock a ringbuffer data block into memory.
+        """
+        return self._client.set_timebase_callback(self._callback, conditional)
 
-        Uses the ``mlock()`` system call.  This prevents the
-        ringbuffer's memory from being paged to the swap area.
+    def stop(self):
+        """De-register as timebase master.
 
-        .. note:: This is not a realtime operation.
+        See `Client.release_timebase()`.
 
         """
-        _check(_lib.jack_ringbuffer_mlock(self._ptr),
-               'Error mlocking the RingBuffer data')
+        self._client.release_timebase()
 
-    def reset(self, size=None):
-        """Reset the read and write pointers, making an empty buffer.
+    def configure(self, tempo=None, beats_per_bar=None, beat_type=None,
+                  ticks_per_beat=None):
+        """Change tempo, meter and/or resolution.
 
-        .. note:: This is not thread safe.
+        Values that are not given are kept.  Bar, beat and tick continue
+        from where they were at the time of the change.  Positions
+        before that (e.g. after relocating the transport) are computed
+        with the new values as well.  If a `TempoMap` was used, it is
+        replaced by the constant values.
 
-        Parameters
-        ----------
-        size : int, optional
-            The new size for the ringbuffer.
-            Must be less than allocated size.
+        """
+        old = self._settings()
+        self._timebase = _Timebase(
+            old.tempo if tempo is None else tempo,
+            old.beats_per_bar if beats_per_bar is None else beats_per_bar,
+            old.beat_type if beat_type is None else beat_type,
+            old.ticks_per_beat if ticks_per_beat is None else ticks_per_beat)
+
+    def set_tempo_map(self, tempo_map):
+        """Use a `TempoMap` to provide tempo and meter changes.
+
+        Opposed to `configure()`, the BBT position is taken from the
+        tempo map (which may lead to a jump at the time of the change).
 
         """
-        if size is None:
-            _lib.jack_ringbuffer_reset(self._ptr)
-        else:
-            _lib.jack_ringbuffer_reset_size(self._ptr, size)
+        if not isinstance(tempo_map, TempoMap):
+            raise TypeError('tempo_map must be a TempoMap')
+        self._timebase = tempo_map
 
-    @property
-    def size(self):
-        """The number of bytes in total used by the buffer.
+    def _settings(self):
+        """Get the latest (possibly not yet used) constant _Timebase.
 
-        See Also
-        --------
-        :attr:`read_space`, :attr:`write_space`
+        With a TempoMap, the segment of the most recent cycle is used.
 
         """
-        return self._ptr.size
+        timebase = self._timebase
+        return timebase if isinstance(timebase, _Timebase) else self._segment
+
+    def _callback(self, state, blocksize, pos, new_pos):
+        timebase = self._timebase
+        frame, frame_rate = pos.frame, pos.frame_rate
+        if timebase is not self._current:
+            if isinstance(timebase, _Timebase) and timebase.frame is None:
+                # Continue from the current position:
+                segment = self._current._segment_at(frame)
+                bar, bar_start_tick, tick = segment.locate(frame, frame_rate)
+                timebase.anchor(frame, bar, bar_start_tick,
+                                tick * timebase.ticks_per_beat
+                                / segment.ticks_per_beat)
+            self._current = timebase
+        self._segment = segment = timebase._segment_at(frame)
+        bar, bar_start_tick, tick = segment.locate(frame, frame_rate)
+        beat, tick = divmod(tick, segment.ticks_per_beat)
+        pos.bar = bar + 1
+        pos.beat = int(beat) + 1
+        pos.tick = int(tick)
+        pos.bar_start_tick = bar_start_tick
+        pos.beats_per_bar = segment.beats_per_bar
+        pos.beat_type = segment.beat_type
+        pos.ticks_per_beat = segment.ticks_per_beat
+        pos.beats_per_minute = segment.tempo
+        pos.valid = _lib.JackPositionBBT
+
+
+class TempoMap:
+    """Piecewise constant tempo and meter.
+
+    The start frame of each segment is computed in advance, which allows
+    converting between frames and BBT (bar, beat, tick) in logarithmic
+    time (w.r.t. the number of segments).  See also `frames_to_bbt()`
+    for converting many frames at once.
+
+    A tempo map can be used with `TimebaseMaster.set_tempo_map()` and
+    to interpret `Client.transport_frame` or `TransportSnapshot.frame`.
 
+    Parameters
+    ----------
+    segments : iterable of tuple
+        ``(bar, tempo)`` or ``(bar, tempo, beats_per_bar, beat_type)``
+        tuples, sorted by *bar*.  Each segment starts at the beginning
+        of the given *bar* (counting from 1), the first one must start
+        at bar 1.  If the meter is not given, the one from the previous
+        segment is used (4/4 for the first segment).
+    frame_rate : int
+        The frame rate used to convert time to frames.  This should be
+        the same as `Client.samplerate`.
+    ticks_per_beat : float, optional
+        Resolution of the *tick* values.
 
-class Status:
-    """Representation of the JACK status bits."""
+    """
 
-    __slots__ = '_code'
+    def __init__(self, segments, frame_rate, ticks_per_beat=1920.0):
+        self.frame_rate = frame_rate
+        self.ticks_per_beat = ticks_per_beat
+        self._segments = []
+        self._bars = []  # Bar index of each segment
+        self._frames = []  # Start frame of each segment
+        self._arrays = None
+        meter = 4.0, 4.0
+        previous = None
+        for bar, tempo, *new_meter in segments:
+            if new_meter:
+                meter = tuple(map(float, new_meter))
+            segment = _Timebase(tempo, *meter, ticks_per_beat)
+            bar -= 1
+            if previous is None:
+                if bar != 0:
+                    raise ValueError('The first segment must start at bar 1')
+                segment.anchor(0.0, 0, 0.0, 0.0)
+            else:
+                bars = bar - previous.bar
+                if bars <= 0:
+                    raise ValueError('Segments must be sorted by bar')
+                ticks = bars * previous.ticks_per_bar
+                segment.anchor(
+                    previous.frame
+                    + ticks / previous.ticks_per_second * frame_rate,
+                    bar, previous.bar_start_tick + ticks, 0.0)
+            self._segments.append(segment)
+            self._bars.append(segment.bar)
+            self._frames.append(segment.frame)
+            previous = segment
+        if not self._segments:
+            raise ValueError('At least one segment is needed')
 
-    def __init__(self, code):
-        self._code = code
+    def __len__(self):
+        return len(self._segments)
 
     def __repr__(self):
-        flags = ', '.join(name for name in dir(self)
-                          if not name.startswith('_') and getattr(self, name))
-        if not flags:
-            flags = 'no flags set'
-        return f'<jack.Status 0x{self._code:X}: {flags}>'
+        return f'<jack.TempoMap: {len(self)} segments>'
 
     @property
-    def failure(self):
-        """Overall operation failed."""
-        return self._hasflag(_lib.JackFailure)
+    def segments(self):
+        """List of ``(bar, tempo, beats_per_bar, beat_type)`` tuples."""
+        return [(s.bar + 1, s.tempo, s.beats_per_bar, s.beat_type)
+                for s in self._segments]
 
-    @property
-    def invalid_option(self):
-        """The operation contained an invalid or unsupported option."""
-        return self._hasflag(_lib.JackInvalidOption)
+    def tempo_at(self, frame):
+        """Get ``(tempo, beats_per_bar, beat_type)`` at *frame*."""
+        segment = self._segment_at(frame)
+        return segment.tempo, segment.beats_per_bar, segment.beat_type
 
-    @property
-    def name_not_unique(self):
-        """The desired client name was not unique.
+    def frame_to_bbt(self, frame):
+        """Convert a frame to ``(bar, beat, tick)``.
 
-        With the *use_exact_name* option of `Client`, this situation is
-        fatal.  Otherwise, the name is modified by appending a dash and
-        a two-digit number in the range "-01" to "-99".  `Client.name`
-        will return the exact string that was used.  If the specified
-        *name* plus these extra characters would be too long, the open
-        fails instead.
+        *bar* and *beat* start at 1, *tick* starts at 0.
 
         """
-        return self._hasflag(_lib.JackNameNotUnique)
+        bar, _, tick = self._segment_at(frame).locate(frame, self.frame_rate)
+        beat, tick = divmod(tick, self.ticks_per_beat)
+        return bar + 1, int(beat) + 1, int(tick)
 
-    @property
-    def server_started(self):
-        """The JACK server was started for this `Client`.
+    def bbt_to_frame(self, bar, beat=1, tick=0):
+        """Convert ``(bar, beat, tick)`` to a (fractional) frame.
 
-        Otherwise, it was running already.
+        *bar* and *beat* start at 1, *tick* starts at 0.
 
         """
-        return self._hasflag(_lib.JackServerStarted)
+        idx = _bisect.bisect_right(self._bars, bar - 1) - 1
+        segment = self._segments[max(idx, 0)]
+        ticks = ((bar - 1 - segment.bar) * segment.ticks_per_bar
+                 + (beat - 1) * self.ticks_per_beat + tick)
+        return (segment.frame
+                + ticks / segment.ticks_per_second * self.frame_rate)
 
-    @property
-    def server_failed(self):
-        """Unable to connect to the JACK server."""
-        return self._hasflag(_lib.JackServerFailed)
+    def frames_to_bbt(self, frames):
+        """Convert an array of frames to bars, beats and ticks.
 
-    @property
-    def server_error(self):
-        """Communication error with the JACK server."""
-        return self._hasflag(_lib.JackServerError)
+        This needs NumPy.
 
-    @property
-    def no_such_client(self):
-        """Requested client does not exist."""
-        return self._hasflag(_lib.JackNoSuchClient)
+        Parameters
+        ----------
+        frames : array_like
+            Frame numbers.
 
-    @property
-    def load_failure(self):
-        """Unable to load internal client."""
-        return self._hasflag(_lib.JackLoadFailure)
+        Returns
+        -------
+        bars, beats, ticks : numpy.ndarray
+            Integer arrays with the same shape as *frames*, see
+            `frame_to_bbt()`.
 
-    @property
-    def init_failure(self):
-        """Unable to initialize client."""
-        return self._hasflag(_lib.JackInitFailure)
+        """
+        import numpy as np
+        if self._arrays is None:
+            segments = self._segments
+            self._arrays = tuple(
+                np.array(values, dtype='float64') for values in (
+                    self._frames,
+                    self._bars,
+                    [s.ticks_per_second / self.frame_rate for s in segments],
+                    [s.ticks_per_bar for s in segments],
+                ))
+        start_frames, start_bars, ticks_per_frame, ticks_per_bar = self._arrays
+        frames = np.asarray(frames, dtype='float64')
+        idx = np.searchsorted(start_frames, frames, side='right') - 1
+        np.maximum(idx, 0, out=idx)
+        ticks = (frames - start_frames[idx]) * ticks_per_frame[idx]
+        bars, ticks = np.divmod(ticks, ticks_per_bar[idx])
+        beats, ticks = np.divmod(ticks, self.ticks_per_beat)
+        bars += start_bars[idx] + 1
+        beats += 1
+        return (bars.astype('int64'), beats.astype('int64'),
+                ticks.astype('int64'))
+
+    def _segment_at(self, frame):
+        idx = _bisect.bisect_right(self._frames, frame) - 1
+        return self._segments[max(idx, 0)]
+
+
+class _Timebase:
+    """Precomputed values for TimebaseMaster and TempoMap.
+
+    The position is computed relative to an anchor (frame, bar index,
+    bar start tick and tick within the bar).
 
-    @property
-    def shm_failure(self):
-        """Unable to access shared memory."""
-        return self._hasflag(_lib.JackShmFailure)
+    """
 
-    @property
-    def version_error(self):
-        """Client's protocol version does not match."""
-        return self._hasflag(_lib.JackVersionError)
+    __slots__ = 'tempo', 'beats_per_bar', 'beat_type', 'ticks_per_beat', \
+        'ticks_per_bar', 'ticks_per_second', 'frame', 'bar', \
+        'bar_start_tick', 'tick'
+
+    def __init__(self, tempo, beats_per_bar, beat_type, ticks_per_beat):
+        if tempo <= 0 or beats_per_bar <= 0 or ticks_per_beat <= 0:
+            raise ValueError('tempo, beats_per_bar and ticks_per_beat '
+                             'must be positive')
+        self.tempo = tempo
+        self.beats_per_bar = beats_per_bar
+        self.beat_type = beat_type
+        self.ticks_per_beat = ticks_per_beat
+        self.ticks_per_bar = beats_per_bar * ticks_per_beat
+        self.ticks_per_second = tempo * ticks_per_beat / 60
+        self.frame = None
+
+    def anchor(self, frame, bar, bar_start_tick, tick):
+        self.bar = bar
+        self.bar_start_tick = bar_start_tick
+        self.tick = tick
+        self.frame = frame  # This has to be last
+
+    def locate(self, frame, frame_rate):
+        """Return bar index, bar start tick and tick within the bar."""
+        tick = self.tick + ((frame - self.frame) * self.ticks_per_second
+                            / frame_rate)
+        bars, tick = divmod(tick, self.ticks_per_bar)
+        bar = self.bar + int(bars)
+        if bar < 0:
+            return 0, 0.0, 0.0
+        return bar, self.bar_start_tick + bars * self.ticks_per_bar, tick
+
+    def _segment_at(self, frame):
+        return self
 
-    @property
-    def backend_error(self):
-        """Backend error."""
-        return self._hasflag(_lib.JackBackendError)
 
-    @property
-    def client_zombie(self):
-        """Client zombified failure."""
-        return self._hasflag(_lib.JackClientZombie)
+class TransportScheduler:
+    """Run non-realtime tasks at given transport positions.
 
-    def _hasflag(self, flag):
-        """Helper function for Status properties."""
-        return bool(self._code & flag)
+    Tasks are called in a background thread shortly before the
+    transport reaches their position, e.g. to load the next scene or to
+    prefetch audio data just in time.  The process callback (see
+    `Client.set_process_callback()`) has to call `process()` in each
+    cycle, which only compares the current transport frame with the
+    next due position, e.g.::
 
+        scheduler = jack.TransportScheduler(client, lookahead=2)
+        scheduler.schedule(60 * client.samplerate, load_next_scene)
 
-class TransportState:
-    """Representation of the JACK transport state.
+        @client.set_process_callback
+        def process(frames):
+            scheduler.process(frames)
 
-    See Also
-    --------
-    `Client.transport_state`, :meth:`Client.transport_query`
+        with client, scheduler:
+            input('Press Return to quit ...')
+
+    Tasks whose position has already been passed (e.g. because the
+    transport was relocated) are called as soon as possible.
 
     """
 
-    __slots__ = '_code'
+    def __init__(self, client, lookahead=0.5, tempo_map=None):
+        """Create a scheduler (which is not yet running).
 
-    def __init__(self, code):
-        self._code = code
+        Parameters
+        ----------
+        client : Client
+            The client whose transport position is used.
+        lookahead : float, optional
+            Time (in seconds) before the scheduled position at which a
+            task is called.
+        tempo_map : TempoMap, optional
+            Needed for `schedule_bbt()`.
 
-    def __eq__(self, other):
-        return self._code == other
+        Attributes
+        ----------
+        tempo_map
+            See above.
+        error
+            Exception raised by the most recent failing task (if any).
 
-    def __hash__(self):
-        return hash(self._code)
+        """
+        self._client = client
+        self._lookahead = int(lookahead * client.samplerate)
+        self.tempo_map = tempo_map
+        self._heap = []  # (due frame, sequence number, task)
+        self._sequence = 0
+        self._lock = _threading.Lock()
+        self._wakeup = _threading.Event()
+        self._next_due = None
+        self._thread = None
+        self._stopping = False
+        self.error = None
 
-    def __repr__(self):
-        return 'jack.' + {
-            _lib.JackTransportStopped: 'STOPPED',
-            _lib.JackTransportRolling: 'ROLLING',
-            _lib.JackTransportStarting: 'STARTING',
-            _lib.JackTransportNetStarting: 'NETSTARTING',
-        }[self._code]
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def __len__(self):
+        """Number of pending (and not yet removed cancelled) tasks."""
+        return len(self._heap)
+
+    def start(self):
+        """Start the background thread."""
+        if self._thread is not None:
+            raise RuntimeError('TransportScheduler is already running')
+        self._stopping = False
+        # Tasks may already be due (and _next_due reset by process()),
+        # so let the thread check the heap once
+        self._wakeup.set()
+        self._thread = _threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread.  Pending tasks are kept."""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+
+    def schedule(self, frame, func, *args):
+        """Call ``func(*args)`` before the transport reaches *frame*.
+
+        Returns
+        -------
+        object
+            A handle that can be passed to `cancel()`.
+
+        """
+        task = _ScheduledTask(frame, func, args)
+        with self._lock:
+            self._sequence += 1
+            _heapq.heappush(
+                self._heap, (frame - self._lookahead, self._sequence, task))
+            self._next_due = self._heap[0][0]
+        return task
+
+    def schedule_bbt(self, bbt, func, *args):
+        """Call ``func(*args)`` before the transport reaches *bbt*.
+
+        *bbt* is a tuple ``(bar, beat)`` or ``(bar, beat, tick)``,
+        which is converted to a frame with `tempo_map`.
+        See `schedule()`.
+
+        """
+        if self.tempo_map is None:
+            raise RuntimeError('schedule_bbt() needs a tempo_map')
+        frame = self.tempo_map.bbt_to_frame(*bbt)
+        return self.schedule(int(frame), func, *args)
+
+    def cancel(self, task):
+        """Cancel a task returned by `schedule()` or `schedule_bbt()`."""
+        task.cancelled = True
+
+    def process(self, frames):
+        """Wake up the background thread if a task is due.
+
+        This must be called in each cycle of the process callback
+        (see `Client.set_process_callback()`).
+
+        """
+        due = self._next_due
+        if due is not None and due <= \
+                _lib.jack_get_current_transport_frame(self._client._ptr):
+            self._next_due = None  # The background thread will update it
+            self._wakeup.set()
+
+    def _run(self):
+        """Background thread for calling tasks."""
+        heap = self._heap
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            while True:
+                frame = _lib.jack_get_current_transport_frame(
+                    self._client._ptr)
+                with self._lock:
+                    if not heap or heap[0][0] > frame:
+                        self._next_due = heap[0][0] if heap else None
+                        break
+                    _, _, task = _heapq.heappop(heap)
+                if task.cancelled:
+                    continue
+                try:
+                    task.func(*task.args)
+                except Exception as e:
+                    self.error = e
+
+
+class _ScheduledTask:
+    """Handle for a task of TransportScheduler."""
+
+    __slots__ = 'frame', 'func', 'args', 'cancelled'
+
+    def __init__(self, frame, func, args):
+        self.frame = frame
+        self.func = func
+        self.args = args
+        self.cancelled = False
 
+    def __repr__(self):
+        return f'<jack.TransportScheduler task at frame {self.frame}>'
 
 
 class CallbackExit(Exception):
@@ -2796,27 +7104,167 @@ def _uuid_parse(uuid):
     if isinstance(uuid, int):
         return uuid
     elif isinstance(uuid, str):
-        uuid_ptr = _ffi.new('jack_uuid_t*')
-        if _lib.jack_uuid_parse(uuid.encode(), uuid_ptr) != 0:
-            raise ValueError(f'Unable to parse UUID: {uuid!r}')
-        return uuid_ptr[0]
+        return _uuid_parse_str(uuid)
     raise TypeError(f'Invalid UUID: {uuid!r}')
 
 
+@_functools.lru_cache(maxsize=1024)
+def _uuid_parse_str(uuid):
+    uuid_ptr = _ffi.new('jack_uuid_t*')
+    if _lib.jack_uuid_parse(uuid.encode(), uuid_ptr) != 0:
+        raise ValueError(f'Unable to parse UUID: {uuid!r}')
+    return uuid_ptr[0]
+
+
+class _Encoder(dict):
+    """Encode strings, remembering the results."""
+
+    def __call__(self, text):
+        if isinstance(text, bytes):
+            return text
+        try:
+            return self[text]
+        except KeyError:
+            if not isinstance(text, str):
+                raise TypeError(f'Expected str or bytes, got {text!r}')
+            encoded = self[text] = text.encode()
+            return encoded
+
+
+def _decode_names(names):
+    """Generate strings from a NULL-terminated array of C strings."""
+    idx = 0
+    while names:
+        name = names[idx]
+        if not name:
+            break
+        yield _decode(name)
+        idx += 1
+
+
+def _port_name(port_ptr):
+    """Get full port name, or None for a NULL pointer."""
+    return _decode(_lib.jack_port_name(port_ptr)) if port_ptr else None
+
+
+def _connection_names(a, b):
+    """Get (source, destination) names (or None) for two port pointers."""
+    if a and not _lib.jack_port_flags(a) & _lib.JackPortIsOutput:
+        a, b = b, a
+    return _port_name(a), _port_name(b)
+
+
+def _rename_pairs(pairs, old, new):
+    """Rename a port in a dict with (source, destination) keys."""
+    return {(new if source == old else source,
+             new if destination == old else destination): None
+            for source, destination in pairs}
+
+
+def _get_aliases(port_ptr):
+    """Get list of aliases of a port."""
+    ctype = f'char[{_lib.jack_port_name_size()}]'
+    aliases = [_ffi.new(ctype), _ffi.new(ctype)]
+    aliasesptr = _ffi.new('char *[]', aliases)
+    result = []
+    if _lib.jack_port_get_aliases(port_ptr, aliasesptr) > 0:
+        for i in 0, 1:
+            alias = _decode(aliases[i])
+            if alias:
+                result.append(alias)
+    return result
+
+
 def _description_to_dict(desc):
     assert desc != _ffi.NULL
+    prop_dict = _decode_properties(desc)
+    free_description_itself = 0
+    _lib.jack_free_description(desc, free_description_itself)
+    return prop_dict
+
+
+def _decode_properties(desc, prefix=b''):
+    """Get dict of properties (optionally only keys starting with prefix)."""
     prop_dict = {}
     for i in range(desc.property_cnt):
         prop = desc.properties[i]
-        key = _decode(prop.key)
-        prop_dict[key] = (
-            _ffi.string(prop.data),
-            _decode(prop.type) if prop.type else '')
-    free_description_itself = 0
-    _lib.jack_free_description(desc, free_description_itself)
+        key = _ffi.string(prop.key)
+        if key.startswith(prefix):
+            prop_dict[key.decode()] = (
+                _ffi.string(prop.data),
+                _decode(prop.type) if prop.type else '')
     return prop_dict
 
 
+def _escape_label(value):
+    """Escape a label value for the OpenMetrics text format."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n')
+
+
+def _parse_wav_header(header, filesize):
+    """Get format information from the beginning of a WAV/RF64 file.
+
+    Returns None if *header* doesn't belong to a WAV file, otherwise a
+    tuple (format_tag, channels, samplerate, bits, data_offset,
+    data_size).
+
+    """
+    if header[:4] not in (b'RIFF', b'RF64') or header[8:12] != b'WAVE':
+        return None
+    ds64_data_size = None
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(header):
+        chunk_id, chunk_size = _struct.unpack_from('<4sI', header, pos)
+        pos += 8
+        if chunk_id == b'ds64':
+            ds64_data_size, = _struct.unpack_from('<Q', header, pos + 8)
+        elif chunk_id == b'fmt ':
+            fmt = _struct.unpack_from('<HHIIHH', header, pos)
+            if fmt[0] == _WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26:
+                fmt = (_struct.unpack_from('<H', header, pos + 24)[0],
+                       ) + fmt[1:]
+        elif chunk_id == b'data':
+            if fmt is None:
+                break
+            if chunk_size == 0xFFFFFFFF and ds64_data_size is not None:
+                chunk_size = ds64_data_size
+            # The size might be wrong in unfinished files:
+            if chunk_size == 0 or pos + chunk_size > filesize:
+                chunk_size = filesize - pos
+            tag, channels, samplerate, _, _, bits = fmt
+            return tag, channels, samplerate, bits, pos, chunk_size
+        pos += chunk_size + (chunk_size & 1)
+    raise ValueError('Invalid or unsupported WAV header')
+
+
+def _make_wav_header(channels, samplerate, data_size):
+    """Create a 32-bit float WAV/RF64 header of _WAV_HEADER_SIZE bytes.
+
+    The header contains a JUNK chunk which is replaced by a ds64 chunk
+    if the file doesn't fit into the limits of RIFF.  The header is
+    padded with another JUNK chunk to keep the audio data aligned.
+
+    """
+    blockalign = 4 * channels
+    riff_size = _WAV_HEADER_SIZE - 8 + data_size
+    if riff_size <= 0xFFFFFFFF:
+        header = _struct.pack('<4sI4s4sI28x', b'RIFF', riff_size, b'WAVE',
+                              b'JUNK', 28)
+    else:
+        header = _struct.pack('<4sI4s4sIQQQI', b'RF64', 0xFFFFFFFF, b'WAVE',
+                              b'ds64', 28, riff_size, data_size,
+                              data_size // blockalign, 0)
+        data_size = 0xFFFFFFFF
+    header += _struct.pack('<4sIHHIIHH', b'fmt ', 16, _WAVE_FORMAT_IEEE_FLOAT,
+                           channels, samplerate, samplerate * blockalign,
+                           blockalign, 32)
+    padding = _WAV_HEADER_SIZE - len(header) - 16
+    header += _struct.pack('<4sI', b'JUNK', padding) + bytes(padding)
+    return header + _struct.pack('<4sI', b'data', data_size)
+
+
 def get_property(subject, key):
     """Get a metadata property on *subject*.
 
@@ -2893,12 +7341,18 @@ def get_properties(subject):
     return _description_to_dict(desc)
 
 
-def get_all_properties():
+def get_all_properties(lazy=False):
     """Get all properties for all subjects with metadata.
 
+    Parameters
+    ----------
+    lazy : bool, optional
+        If ``True``, the properties are only decoded when they are
+        accessed, see `PropertyMap`.
+
     Returns
     -------
-    dict
+    dict or PropertyMap
         A dictionary mapping UUIDs to nested dictionaries as returned by
         `get_properties()`.
 
@@ -2917,6 +7371,8 @@ def get_all_properties():
     number = _lib.jack_get_all_properties(descs)
     if number < 0:
         raise RuntimeError('Error getting all properties')
+    if lazy:
+        return PropertyMap(descs[0], number)
     descs = _ffi.gc(descs[0], _lib.jack_free)
     prop_dict = {}
     for idx in range(number):
@@ -2946,6 +7402,16 @@ def position2dict(pos):
     return {k: getattr(pos, k) for k in keys}
 
 
+def get_time():
+    """Get JACK's current system time in microseconds.
+
+    This uses the same time base as `Client.frames_to_time()`,
+    `Client.time_to_frames()` and `Client.cycle_times()`.
+
+    """
+    return _lib.jack_get_time()
+
+
 def version():
     """Get tuple of major/minor/micro/protocol version."""
     v = _ffi.new('int[4]')
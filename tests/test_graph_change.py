@@ -0,0 +1,112 @@
+import jack
+
+
+def register(name):
+    return 'port_registration', name, True
+
+
+def unregister(name):
+    return 'port_registration', name, False
+
+
+def connect(source, destination):
+    return 'port_connect', source, destination, True
+
+
+def disconnect(source, destination):
+    return 'port_connect', source, destination, False
+
+
+def rename(old, new):
+    return 'port_rename', old, new
+
+
+def test_empty():
+    change = jack.GraphChange([])
+    assert not change
+    assert change.added == []
+    assert change.connected == []
+
+
+def test_added_and_connected():
+    change = jack.GraphChange([register('a:1'), connect('a:1', 'b:1')])
+    assert change.added == ['a:1']
+    assert change.connected == [('a:1', 'b:1')]
+    assert change.removed == []
+
+
+def test_registered_and_unregistered_again():
+    change = jack.GraphChange([
+        register('a:1'), connect('a:1', 'b:1'), unregister('a:1')])
+    assert not change
+
+
+def test_connected_and_disconnected_again():
+    change = jack.GraphChange([
+        connect('a:1', 'b:1'), disconnect('a:1', 'b:1')])
+    assert not change
+
+
+def test_disconnected_and_connected_again():
+    change = jack.GraphChange([
+        disconnect('a:1', 'b:1'), connect('a:1', 'b:1')])
+    assert not change
+
+
+def test_connected_and_unregistered():
+    change = jack.GraphChange([
+        connect('a:1', 'b:1'), connect('c:1', 'b:2'), unregister('a:1')])
+    assert change.removed == ['a:1']
+    assert change.connected == [('c:1', 'b:2')]
+    assert change.disconnected == []
+
+
+def test_disconnected_and_unregistered():
+    change = jack.GraphChange([disconnect('a:1', 'b:1'), unregister('b:1')])
+    assert change.removed == ['b:1']
+    assert change.disconnected == []
+
+
+def test_renamed_connected_and_unregistered():
+    change = jack.GraphChange([
+        rename('a:1', 'a:2'), connect('a:2', 'b:1'), unregister('a:2')])
+    assert change.removed == ['a:1']
+    assert change.renamed == []
+    assert change.connected == []
+
+
+def test_unregistered_and_registered_again():
+    change = jack.GraphChange([
+        connect('a:1', 'b:1'), unregister('a:1'),
+        register('a:1'), connect('a:1', 'b:2')])
+    assert change.removed == ['a:1']
+    assert change.added == ['a:1']
+    assert change.connected == [('a:1', 'b:2')]
+
+
+def test_renamed():
+    change = jack.GraphChange([
+        connect('a:1', 'b:1'), rename('a:1', 'a:2'), rename('a:2', 'a:3')])
+    assert change.renamed == [('a:1', 'a:3')]
+    assert change.connected == [('a:3', 'b:1')]
+
+
+def test_renamed_back():
+    change = jack.GraphChange([rename('a:1', 'a:2'), rename('a:2', 'a:1')])
+    assert not change
+
+
+def test_added_and_renamed():
+    change = jack.GraphChange([register('a:1'), rename('a:1', 'a:2')])
+    assert change.added == ['a:2']
+    assert change.renamed == []
+
+
+def test_incomplete():
+    change = jack.GraphChange([register(None)])
+    assert change.incomplete
+    assert change
+    change = jack.GraphChange([connect(None, 'b:1')])
+    assert change.incomplete
+    change = jack.GraphChange([disconnect(None, 'b:1')])
+    assert not change.incomplete